@@ -0,0 +1,93 @@
+"""Decoder of Tuya BLE sessions in btsnoop HCI logs.
+
+Run from the repository root inside a Home Assistant development environment:
+
+    python -m benchmarks.btsnoop btsnoop_hci.log --local-key KEY
+    python -m benchmarks.btsnoop btsnoop_hci.log --local-key KEY \\
+        --address DC:23:4D:11:22:33 --csv > timeline.csv
+
+Prints timeline of datapoints sent to and reported by the device, with
+--frames every decoded frame too. The log is read as a stream, so captures
+of any size can be decoded. Use --address when the log has connections to
+more than one device, and --write-handle/--notify-handle when it does not
+include characteristic discovery and other devices were connected too.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+import sys
+from datetime import datetime
+
+from custom_components.tuya_ble.tuya_ble.capture import (
+    TuyaBLECaptureRecordType,
+)
+
+from .capture import TuyaBLECaptureDecoder
+from .hci_log import TuyaBLEHciLogReader
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log")
+    parser.add_argument("--local-key", required=True)
+    parser.add_argument("--address")
+    parser.add_argument("--write-handle", type=lambda value: int(value, 0))
+    parser.add_argument("--notify-handle", type=lambda value: int(value, 0))
+    parser.add_argument("--frames", action="store_true")
+    parser.add_argument("--csv", action="store_true")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.disable(logging.CRITICAL)
+
+    writer = csv.writer(sys.stdout) if args.csv else None
+    if writer:
+        writer.writerow(("time", "direction", "dp_id", "type", "value"))
+    decoder = TuyaBLECaptureDecoder(args.local_key)
+    frames = 0
+    with open(args.log, "rb") as file:
+        reader = TuyaBLEHciLogReader(
+            file, args.address, args.write_handle, args.notify_handle
+        )
+        for record in reader:
+            when = datetime.fromtimestamp(record.timestamp).isoformat(
+                sep=" ", timespec="milliseconds"
+            )
+            if not writer and record.type in (
+                TuyaBLECaptureRecordType.CONNECTED,
+                TuyaBLECaptureRecordType.DISCONNECTED,
+            ):
+                print(f"{when} {record.type.name.lower()}")
+            for frame in decoder.decode(record):
+                frames += 1
+                received = frame.type == TuyaBLECaptureRecordType.RECEIVED
+                direction = "<-" if received else "->"
+                if args.frames and not writer:
+                    print(
+                        f"{when} {direction} #{frame.seq_num} {frame.code.name}"
+                        f" {frame.data.hex()}"
+                    )
+                for dp_id, type, value in frame.datapoints:
+                    if writer:
+                        writer.writerow(
+                            (when, "device" if received else "host", dp_id,
+                             type.name, value)
+                        )
+                    else:
+                        print(f"{when} {direction} dp {dp_id} {type.name} {value!r}")
+
+    print(
+        f"{reader.records} HCI records ({reader.truncated} truncated),"
+        f" {frames} frames, {decoder.errors} malformed",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
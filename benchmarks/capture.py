@@ -0,0 +1,251 @@
+"""Offline decoder and replay benchmark of captured Tuya BLE traffic.
+
+Capture is recorded by TuyaBLEDevice.start_capture(path). Run from the
+repository root inside a Home Assistant development environment:
+
+    python -m benchmarks.capture capture.bin --local-key KEY
+    python -m benchmarks.capture capture.bin --local-key KEY --benchmark
+
+Every frame is printed with the datapoints it carries. Received
+notifications go through the same reassembly, decryption and datapoints
+parsing as in TuyaBLEDevice, so sessions are decoded only when the capture
+includes the device info response which starts them. With --benchmark the
+received notifications are replayed repeatedly and time per notification
+and per frame is reported.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import time
+import timeit
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from custom_components.tuya_ble.tuya_ble.capture import (
+    TuyaBLECaptureRecord,
+    TuyaBLECaptureRecordType,
+    read_capture,
+)
+from custom_components.tuya_ble.tuya_ble.const import (
+    TuyaBLECode,
+    TuyaBLEDataPointType,
+)
+from custom_components.tuya_ble.tuya_ble.exceptions import (
+    TuyaBLEDataCRCError,
+    TuyaBLEDataFormatError,
+    TuyaBLEDataLengthError,
+)
+from custom_components.tuya_ble.tuya_ble.protocol import (
+    TuyaBLEDatapointsEvent,
+    TuyaBLEEvent,
+    TuyaBLEProtocol,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class TuyaBLEDecodedFrame:
+    """Complete frame decoded from the capture."""
+
+    timestamp: float
+    type: TuyaBLECaptureRecordType
+    seq_num: int
+    response_to: int
+    code: TuyaBLECode
+    data: bytes
+    datapoints: list[
+        tuple[int, TuyaBLEDataPointType, bytes | bool | int | str]
+    ] = field(default_factory=list)
+
+
+class _TuyaBLEDecodingProtocol(TuyaBLEProtocol):
+    """Protocol core which keeps every completed frame for the decoder.
+
+    Frames received from the device are handled as by TuyaBLEDevice, so
+    session keys are derived the same way. Sent frames are only decoded.
+    """
+
+    def __init__(self, name: str, sent: bool) -> None:
+        super().__init__(name)
+        self.sent = sent
+        self.frames: list[
+            tuple[int, int, TuyaBLECode, bytes, list[TuyaBLEEvent]]
+        ] = []
+
+    def _handle_command_or_response(
+        self, seq_num: int, response_to: int, code: TuyaBLECode, data: bytes
+    ) -> list[TuyaBLEEvent]:
+        events: list[TuyaBLEEvent] = []
+        if self.sent:
+            match code:
+                case TuyaBLECode.FUN_SENDER_DPS:
+                    events.append(
+                        self._parse_datapoints_v3(time.time(), 0, data, 0)
+                    )
+                case TuyaBLECode.FUN_SENDER_DPS_V4:
+                    events.append(
+                        self._parse_datapoints_v4(time.time(), 0, data, 6)
+                    )
+        else:
+            events = super()._handle_command_or_response(
+                seq_num, response_to, code, data
+            )
+        self.frames.append((seq_num, response_to, code, data, events))
+        return events
+
+
+class TuyaBLECaptureDecoder:
+    """Decodes captured traffic of one device given its local key."""
+
+    def __init__(self, local_key: str, name: str = "") -> None:
+        self._received = _TuyaBLEDecodingProtocol(name, False)
+        self._sent = _TuyaBLEDecodingProtocol(name, True)
+        for protocol in (self._received, self._sent):
+            protocol.set_local_key(local_key[:6].encode())
+        self.errors = 0
+
+    @property
+    def protocol(self) -> TuyaBLEProtocol:
+        """Protocol state as negotiated with the device."""
+        return self._received
+
+    def decode(self, record: TuyaBLECaptureRecord) -> list[TuyaBLEDecodedFrame]:
+        """Feed one record, returns frames it completed."""
+        match record.type:
+            case TuyaBLECaptureRecordType.CONNECTED | (
+                TuyaBLECaptureRecordType.DISCONNECTED
+            ):
+                self._received.reset()
+                self._sent.reset()
+                return []
+            case TuyaBLECaptureRecordType.RECEIVED:
+                protocol = self._received
+            case TuyaBLECaptureRecordType.SENT:
+                protocol = self._sent
+
+        try:
+            protocol.receive_data(record.data)
+        except (
+            TuyaBLEDataCRCError,
+            TuyaBLEDataFormatError,
+            TuyaBLEDataLengthError,
+        ):
+            self.errors += 1
+            _LOGGER.debug("Malformed frame in capture", exc_info=True)
+
+        if self._sent.session_key != self._received.session_key:
+            # New session was negotiated by the device info response
+            self._sent.session_key = self._received.session_key
+            self._sent._ciphers.clear()
+        self._sent.protocol_version = self._received.protocol_version
+
+        frames: list[TuyaBLEDecodedFrame] = []
+        for seq_num, response_to, code, data, events in protocol.frames:
+            frame = TuyaBLEDecodedFrame(
+                record.timestamp, record.type, seq_num, response_to, code, data
+            )
+            for event in events:
+                if isinstance(event, TuyaBLEDatapointsEvent):
+                    frame.datapoints += event.datapoints
+            frames.append(frame)
+        protocol.frames.clear()
+        return frames
+
+
+def decode(records: list[TuyaBLECaptureRecord], local_key: str) -> int:
+    decoder = TuyaBLECaptureDecoder(local_key)
+    frames = 0
+    for record in records:
+        when = datetime.fromtimestamp(record.timestamp).isoformat(
+            sep=" ", timespec="milliseconds"
+        )
+        if record.type in (
+            TuyaBLECaptureRecordType.CONNECTED,
+            TuyaBLECaptureRecordType.DISCONNECTED,
+        ):
+            print(f"{when} {record.type.name.lower()}")
+        for frame in decoder.decode(record):
+            frames += 1
+            direction = "<-" if frame.type == TuyaBLECaptureRecordType.RECEIVED else "->"
+            response = f" response to #{frame.response_to}" if frame.response_to else ""
+            print(
+                f"{when} {direction} #{frame.seq_num} {frame.code.name}{response}"
+                f" {frame.data.hex()}"
+            )
+            for dp_id, type, value in frame.datapoints:
+                print(f"{'':26} dp {dp_id} {type.name} {value!r}")
+    print(
+        f"{len(records)} records, {frames} frames, {decoder.errors} malformed"
+    )
+    return frames
+
+
+def replay(received: list[bytes], local_key: str) -> int:
+    protocol = TuyaBLEProtocol()
+    protocol.set_local_key(local_key[:6].encode())
+    events = 0
+    for data in received:
+        try:
+            events += len(protocol.receive_data(data))
+        except (TuyaBLEDataCRCError, TuyaBLEDataFormatError, TuyaBLEDataLengthError):
+            pass
+    return events
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture")
+    parser.add_argument("--local-key", required=True)
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.disable(logging.CRITICAL)
+
+    with open(args.capture, "rb") as file:
+        records = list(read_capture(file))
+
+    if not args.benchmark:
+        decode(records, args.local_key)
+        return 0
+
+    logging.disable(logging.CRITICAL)
+    received = [
+        record.data
+        for record in records
+        if record.type == TuyaBLECaptureRecordType.RECEIVED
+    ]
+    decoder = TuyaBLECaptureDecoder(args.local_key)
+    frames = sum(
+        len(decoder.decode(record))
+        for record in records
+        if record.type == TuyaBLECaptureRecordType.RECEIVED
+    )
+    start = time.perf_counter()
+    best = min(
+        timeit.repeat(
+            lambda: replay(received, args.local_key),
+            number=args.number,
+            repeat=args.repeat,
+        )
+    )
+    per_run = best / args.number
+    print(
+        f"{len(received)} notifications, {frames} frames:"
+        f" {per_run / max(1, len(received)) * 1e6:.2f} us per notification,"
+        f" {per_run / max(1, frames) * 1e6:.2f} us per frame"
+        f" (measured in {time.perf_counter() - start:.1f} s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Micro-benchmarks of the Tuya BLE frame codec.
+
+Run from the repository root inside a Home Assistant development environment:
+
+    python -m benchmarks.codec
+    python -m benchmarks.codec --save baseline.json
+    python -m benchmarks.codec --compare baseline.json --tolerance 0.25
+
+Payloads are generated from a fixed seed, so runs are reproducible between
+machines and revisions. With --compare the exit code is 1 when any case got
+slower than the saved baseline by more than the tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import sys
+import timeit
+from collections.abc import Callable
+
+from bleak.backends.device import BLEDevice
+
+from custom_components.tuya_ble.tuya_ble.codec import (
+    calc_crc16,
+    pack_int,
+    unpack_int,
+)
+from custom_components.tuya_ble.tuya_ble.const import TuyaBLECode
+from custom_components.tuya_ble.tuya_ble.protocol import TuyaBLEProtocol
+from custom_components.tuya_ble.tuya_ble.tuya_ble import TuyaBLEDevice
+
+SEED = 0x7475796
+LOCAL_KEY = b"012345"
+
+
+def calc_crc16_bitwise(data: bytes) -> int:
+    """Reference implementation, processes input one bit at a time."""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte & 255
+        for _ in range(8):
+            tmp = crc & 1
+            crc >>= 1
+            if tmp != 0:
+                crc ^= 0xA001
+    return crc
+
+
+def setup_protocol(protocol: TuyaBLEProtocol, protocol_version: int = 3) -> None:
+    """Set keys as if the session was established with zero random."""
+    protocol.set_local_key(LOCAL_KEY)
+    protocol.session_key = hashlib.md5(LOCAL_KEY + bytes(6)).digest()
+    protocol.protocol_version = protocol_version
+
+
+def make_protocol(protocol_version: int = 3) -> TuyaBLEProtocol:
+    protocol = TuyaBLEProtocol("bench")
+    setup_protocol(protocol, protocol_version)
+    return protocol
+
+
+def make_device(protocol_version: int = 3) -> TuyaBLEDevice:
+    device = TuyaBLEDevice(None, BLEDevice("00:11:22:33:44:55", "bench", None))
+    setup_protocol(device.protocol, protocol_version)
+    return device
+
+
+def make_datapoints(rng: random.Random, count: int) -> bytes:
+    data = bytearray()
+    for dp_id in range(1, count + 1):
+        data += bytes((dp_id, 2, 4))
+        data += rng.getrandbits(31).to_bytes(4, "big")
+    return bytes(data)
+
+
+def build_cases(rng: random.Random) -> dict[str, Callable[[], object]]:
+    protocol = make_protocol()
+    small = rng.randbytes(32)
+    large = rng.randbytes(256)
+    datapoints = make_datapoints(rng, 8)
+    varint = pack_int(0x0FFFFFFF)
+
+    # Frame as sent by the device: response to status request
+    response = protocol.build_packets(2, TuyaBLECode.FUN_SENDER_DEVICE_STATUS, b"\x00", 1)
+    # Multi-notification frame of a code that has no side effects on receive
+    large_frame = protocol.build_packets(3, TuyaBLECode.FUN_SENDER_OTA_START, large, 1)
+
+    def parse(packets: list[bytes]) -> None:
+        for packet in packets:
+            protocol.receive_data(packet)
+
+    return {
+        "crc16_bitwise_32": lambda: calc_crc16_bitwise(small),
+        "crc16_32": lambda: calc_crc16(small),
+        "crc16_256": lambda: calc_crc16(large),
+        "pack_int": lambda: pack_int(0x0FFFFFFF),
+        "unpack_int": lambda: unpack_int(varint, 0),
+        "build_packets_small": lambda: protocol.build_packets(
+            1, TuyaBLECode.FUN_SENDER_DPS, small[:8]
+        ),
+        "build_packets_large": lambda: protocol.build_packets(
+            1, TuyaBLECode.FUN_SENDER_DPS, large
+        ),
+        "parse_frame_small": lambda: parse(response),
+        "parse_frame_large": lambda: parse(large_frame),
+        "parse_datapoints_v3": lambda: protocol._parse_datapoints_v3(
+            0.0, 0, datapoints, 0
+        ),
+    }
+
+
+def run(number: int, repeat: int) -> dict[str, float]:
+    """Return best time of a single call per case, in microseconds."""
+    cases = build_cases(random.Random(SEED))
+    results: dict[str, float] = {}
+    for name, func in cases.items():
+        best = min(timeit.repeat(func, number=number, repeat=repeat))
+        results[name] = best / number * 1e6
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", metavar="FILE", help="save results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="compare with saved results")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = run(args.number, args.repeat)
+
+    baseline: dict[str, float] = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    failed = False
+    for name, value in results.items():
+        line = f"{name:24} {value:10.2f} us"
+        if name in baseline:
+            ratio = value / baseline[name]
+            line += f"  x{ratio:.2f}"
+            if ratio > 1 + args.tolerance:
+                line += "  REGRESSION"
+                failed = True
+        print(line)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,587 @@
+"""In-process simulator of Tuya BLE devices.
+
+The simulator implements the device side of the protocol on top of
+TuyaBLEProtocol and a fake BLE client, so TuyaBLEDevice can be connected,
+paired, polled and controlled without hardware. It is used by the
+benchmarks only and is not shipped with the integration:
+
+    simulator = TuyaBLESimulator()
+    peripheral = simulator.add_device(TuyaBLESimulatorConfig(latency=0.02))
+    device = TuyaBLEDevice(
+        simulator,
+        peripheral.ble_device,
+        connector=simulator.establish_connection,
+    )
+
+Latency, packet loss and MTU of the link are configurable per device.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import random
+import secrets
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from struct import pack
+
+from bleak.backends.device import BLEDevice
+from bleak_retry_connector import BleakError, BleakNotFoundError
+
+from custom_components.tuya_ble.tuya_ble.const import (
+    CHARACTERISTIC_NOTIFY,
+    CHARACTERISTIC_WRITE,
+    GATT_MTU,
+    TuyaBLECode,
+    TuyaBLEDataPointType,
+)
+from custom_components.tuya_ble.tuya_ble.exceptions import (
+    TuyaBLEDataCRCError,
+    TuyaBLEDataFormatError,
+    TuyaBLEDataLengthError,
+)
+from custom_components.tuya_ble.tuya_ble.manager import (
+    AbstaractTuyaBLEDeviceManager,
+    TuyaBLEDeviceCredentials,
+)
+from custom_components.tuya_ble.tuya_ble.protocol import (
+    TuyaBLEEvent,
+    TuyaBLEProtocol,
+    encode_datapoint_value,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SIMULATOR_ADAPTER = "simulator"
+
+
+@dataclass
+class TuyaBLESimulatorConfig:
+    """Behaviour of one simulated device and its link."""
+
+    address: str | None = None
+    name: str = "Simulated device"
+    uuid: str = "tuyasimulated000"
+    local_key: str = "0123456789abcdef"
+    device_id: str = "simulated0000000000000"
+    category: str = "szjqr"
+    product_id: str = "simulated"
+    protocol_version: int = 3
+    device_version: tuple[int, int] = (1, 0)
+    hardware_version: tuple[int, int] = (1, 0)
+    # One way delay of every packet and its random addition, in seconds
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Probability that a packet is lost, in each direction
+    loss: float = 0.0
+    gatt_mtu: int = GATT_MTU
+    connect_delay: float = 0.0
+    # Probability that a connection attempt fails
+    connect_failure: float = 0.0
+    # Datapoints reported in response to status request
+    datapoints: dict[
+        int, tuple[TuyaBLEDataPointType, bytes | bool | int | str]
+    ] = field(default_factory=dict)
+    # Status is reported in frames of this many datapoints sent this many
+    # seconds apart, as real devices do, 0 reports all in one frame
+    status_frame_datapoints: int = 0
+    status_frame_interval: float = 0.0
+
+
+@dataclass
+class TuyaBLESimulatorStats:
+    """Counters of one simulated device."""
+
+    connects: int = 0
+    failed_connects: int = 0
+    disconnects: int = 0
+    packets_received: int = 0
+    packets_sent: int = 0
+    packets_lost: int = 0
+    frames_received: int = 0
+    frames_sent: int = 0
+    acks_received: int = 0
+    errors: int = 0
+
+
+@dataclass
+class _TuyaBLESimulatorRequest:
+    seq_num: int
+    response_to: int
+    code: TuyaBLECode
+    data: bytes
+
+
+class _TuyaBLEPeripheralProtocol(TuyaBLEProtocol):
+    """Protocol core used by the device side, hands frames over undecoded."""
+
+    def _handle_command_or_response(
+        self, seq_num: int, response_to: int, code: TuyaBLECode, data: bytes
+    ) -> list[TuyaBLEEvent]:
+        return [_TuyaBLESimulatorRequest(seq_num, response_to, code, data)]
+
+
+@dataclass
+class _TuyaBLESimulatedCharacteristic:
+    uuid: str
+    max_write_without_response_size: int
+
+
+class _TuyaBLESimulatedServices:
+    def __init__(self, gatt_mtu: int) -> None:
+        self._characteristics = {
+            uuid: _TuyaBLESimulatedCharacteristic(uuid, gatt_mtu)
+            for uuid in (CHARACTERISTIC_NOTIFY, CHARACTERISTIC_WRITE)
+        }
+
+    def get_characteristic(
+        self, uuid: str
+    ) -> _TuyaBLESimulatedCharacteristic | None:
+        return self._characteristics.get(uuid)
+
+
+class _TuyaBLESimulatedChannel:
+    """One direction of the link, delivers packets in the order they were sent."""
+
+    def __init__(self, deliver: Callable[[bytes], None]) -> None:
+        self._deliver = deliver
+        self._queue: deque[tuple[float, bytes]] = deque()
+        self._handle: asyncio.TimerHandle | None = None
+
+    def put(self, delay: float, packet: bytes) -> None:
+        if not delay and not self._queue:
+            self._deliver(packet)
+            return
+        loop = asyncio.get_running_loop()
+        delivery = loop.time() + delay
+        if self._queue:
+            delivery = max(delivery, self._queue[-1][0])
+        self._queue.append((delivery, packet))
+        if self._handle is None:
+            self._handle = loop.call_at(self._queue[0][0], self._run)
+
+    def close(self) -> None:
+        self._queue.clear()
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def _run(self) -> None:
+        self._handle = None
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        while self._queue and self._queue[0][0] <= now:
+            self._deliver(self._queue.popleft()[1])
+        if self._queue:
+            self._handle = loop.call_at(self._queue[0][0], self._run)
+
+
+class TuyaBLESimulatedClient:
+    """Stands in for BleakClientWithServiceCache of a simulated device."""
+
+    def __init__(
+        self,
+        peripheral: TuyaBLESimulatedDevice,
+        disconnected_callback: Callable[[TuyaBLESimulatedClient], None] | None,
+    ) -> None:
+        self._peripheral = peripheral
+        self._disconnected_callback = disconnected_callback
+        self._notify_callback: Callable[[int, bytearray], None] | None = None
+        self._connected = True
+        self._to_device = _TuyaBLESimulatedChannel(peripheral._receive)
+        self._to_central = _TuyaBLESimulatedChannel(self._notify)
+        self.services = _TuyaBLESimulatedServices(peripheral.config.gatt_mtu)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    @property
+    def address(self) -> str:
+        return self._peripheral.address
+
+    async def start_notify(
+        self, char_specifier: str, callback: Callable[[int, bytearray], None]
+    ) -> None:
+        if not self._connected:
+            raise BleakError("Not connected")
+        self._notify_callback = callback
+
+    async def stop_notify(self, char_specifier: str) -> None:
+        self._notify_callback = None
+
+    async def write_gatt_char(
+        self, char_specifier: str, data: bytes, response: bool = False
+    ) -> None:
+        if not self._connected:
+            raise BleakError("Not connected")
+        if len(data) > self._peripheral.config.gatt_mtu:
+            raise BleakError(
+                "Write of %s bytes exceeds MTU %s"
+                % (len(data), self._peripheral.config.gatt_mtu)
+            )
+        self._peripheral._transmit(self._to_device, bytes(data))
+
+    async def disconnect(self) -> bool:
+        self._peripheral._connection_lost(self)
+        return True
+
+    def _notify(self, data: bytes) -> None:
+        if self._connected and self._notify_callback:
+            self._notify_callback(0, bytearray(data))
+
+    def _set_disconnected(self) -> None:
+        if not self._connected:
+            return
+        self._connected = False
+        self._notify_callback = None
+        self._to_device.close()
+        self._to_central.close()
+        if self._disconnected_callback:
+            self._disconnected_callback(self)
+
+
+class TuyaBLESimulatedDevice:
+    """Device side of the Tuya BLE protocol.
+
+    Answers device info, pairing, status and datapoint requests, reports
+    datapoints in any of the report formats and requests time.
+    """
+
+    def __init__(
+        self, config: TuyaBLESimulatorConfig, rng: random.Random | None = None
+    ) -> None:
+        self.config = config
+        self._rng = rng or random.Random()
+        self.address = config.address or "AA:BB:CC:%02X:%02X:%02X" % tuple(
+            self._rng.randbytes(3)
+        )
+        self.available = True
+        self.stats = TuyaBLESimulatorStats()
+        self.datapoints = dict(config.datapoints)
+        self.time_replies: list[tuple[TuyaBLECode, bytes]] = []
+        self._protocol = _TuyaBLEPeripheralProtocol(self.address, config.gatt_mtu)
+        self._protocol.protocol_version = config.protocol_version
+        self._protocol.set_local_key(config.local_key[:6].encode())
+        self._is_bound = True
+        self._client: TuyaBLESimulatedClient | None = None
+
+    @property
+    def ble_device(self) -> BLEDevice:
+        return BLEDevice(
+            self.address, self.config.name, {"source": SIMULATOR_ADAPTER}
+        )
+
+    @property
+    def credentials(self) -> TuyaBLEDeviceCredentials:
+        return TuyaBLEDeviceCredentials(
+            self.config.uuid,
+            self.config.local_key,
+            self.config.device_id,
+            self.config.category,
+            self.config.product_id,
+            self.config.name,
+            None,
+            None,
+            None,
+            None,
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None and self._client.is_connected
+
+    @property
+    def is_paired(self) -> bool:
+        return self._protocol.is_paired
+
+    async def connect(
+        self,
+        disconnected_callback: Callable[[TuyaBLESimulatedClient], None] | None,
+    ) -> TuyaBLESimulatedClient:
+        """Accept connection from the central."""
+        if self.config.connect_delay:
+            await asyncio.sleep(self.config.connect_delay)
+        if not self.available:
+            self.stats.failed_connects += 1
+            raise BleakNotFoundError("%s: Device is not available" % self.address)
+        if self._rng.random() < self.config.connect_failure:
+            self.stats.failed_connects += 1
+            raise BleakError("%s: Simulated connection failure" % self.address)
+        if self._client:
+            self._connection_lost(self._client)
+        self.stats.connects += 1
+        self._protocol.reset()
+        self._protocol.reset_seq_num()
+        self._client = TuyaBLESimulatedClient(self, disconnected_callback)
+        return self._client
+
+    def disconnect(self) -> None:
+        """Drop the connection as if the device went out of range."""
+        if self._client:
+            self._connection_lost(self._client)
+
+    def set_datapoint(
+        self,
+        dp_id: int,
+        type: TuyaBLEDataPointType,
+        value: bytes | bool | int | str,
+        report: bool = True,
+    ) -> None:
+        """Change value on the device, as a button press would."""
+        self.datapoints[dp_id] = (type, value)
+        if report and self.is_paired:
+            self.report_datapoints([dp_id])
+
+    def report_datapoints(
+        self,
+        dp_ids: list[int] | None = None,
+        timestamp: float | None = None,
+        signed: bool = False,
+    ) -> None:
+        """Send datapoints report in format selected by protocol version."""
+        if dp_ids is None:
+            dp_ids = list(self.datapoints)
+        if not dp_ids:
+            return
+        time_data = b""
+        if timestamp is not None:
+            time_data = pack(">BI", 1, int(timestamp))
+        dp_seq_num = self._protocol.next_dp_seq_num()
+        if self._protocol.protocol_version >= 4:
+            header = pack(">BIBBB", 0, dp_seq_num, 0, 0, 0)
+            if timestamp is not None:
+                code = TuyaBLECode.FUN_RECEIVE_TIME_DP_V4
+            else:
+                code = TuyaBLECode.FUN_RECEIVE_DP_V4
+            data = header + time_data + self._encode_datapoints(dp_ids, ">BBH")
+        else:
+            header = b""
+            if signed:
+                header = pack(">HB", dp_seq_num & 0xFFFF, 0)
+            match (signed, timestamp is not None):
+                case (False, False):
+                    code = TuyaBLECode.FUN_RECEIVE_DP
+                case (False, True):
+                    code = TuyaBLECode.FUN_RECEIVE_TIME_DP
+                case (True, False):
+                    code = TuyaBLECode.FUN_RECEIVE_SIGN_DP
+                case (True, True):
+                    code = TuyaBLECode.FUN_RECEIVE_SIGN_TIME_DP
+            data = header + time_data + self._encode_datapoints(dp_ids, ">BBB")
+        self._send(code, data)
+
+    def _report_status(self) -> None:
+        config = self.config
+        dp_ids = list(self.datapoints)
+        size = config.status_frame_datapoints or len(dp_ids) or 1
+        loop = asyncio.get_running_loop()
+        for index, start in enumerate(range(0, len(dp_ids), size)):
+            frame_dp_ids = dp_ids[start : start + size]
+            if index and config.status_frame_interval:
+                loop.call_later(
+                    index * config.status_frame_interval,
+                    self.report_datapoints,
+                    frame_dp_ids,
+                )
+            else:
+                self.report_datapoints(frame_dp_ids)
+
+    def request_time(
+        self, code: TuyaBLECode = TuyaBLECode.FUN_RECEIVE_TIME1_REQ
+    ) -> None:
+        """Ask the central for current time, reply is kept in time_replies."""
+        self._send(code, bytes(0))
+
+    def _encode_datapoints(self, dp_ids: list[int], header_format: str) -> bytes:
+        data = bytearray()
+        for dp_id in dp_ids:
+            type, value = self.datapoints[dp_id]
+            raw_value = encode_datapoint_value(type, value)
+            data += pack(header_format, dp_id, type.value, len(raw_value))
+            data += raw_value
+        return bytes(data)
+
+    def _connection_lost(self, client: TuyaBLESimulatedClient) -> None:
+        if client is not self._client:
+            return
+        self._client = None
+        self.stats.disconnects += 1
+        self._protocol.reset()
+        client._set_disconnected()
+
+    def _transmit(self, channel: _TuyaBLESimulatedChannel, packet: bytes) -> None:
+        """Deliver packet after the link latency unless it is lost."""
+        config = self.config
+        if config.loss and self._rng.random() < config.loss:
+            self.stats.packets_lost += 1
+            return
+        delay = config.latency
+        if config.jitter:
+            delay += self._rng.uniform(0, config.jitter)
+        channel.put(delay, packet)
+
+    def _send(
+        self, code: TuyaBLECode, data: bytes, response_to: int = 0
+    ) -> None:
+        client = self._client
+        if not (client and client.is_connected):
+            return
+        seq_num = self._protocol.next_seq_num()
+        self.stats.frames_sent += 1
+        for packet in self._protocol.build_packets(
+            seq_num, code, data, response_to
+        ):
+            self.stats.packets_sent += 1
+            self._transmit(client._to_central, packet)
+
+    def _receive(self, packet: bytes) -> None:
+        if not self.connected:
+            return
+        self.stats.packets_received += 1
+        try:
+            requests = self._protocol.receive_data(packet)
+        except (
+            TuyaBLEDataCRCError,
+            TuyaBLEDataFormatError,
+            TuyaBLEDataLengthError,
+        ):
+            self.stats.errors += 1
+            _LOGGER.debug("%s: Malformed frame", self.address, exc_info=True)
+            return
+        for request in requests:
+            self.stats.frames_received += 1
+            self._handle_request(request)
+
+    def _handle_request(self, request: _TuyaBLESimulatorRequest) -> None:
+        if request.response_to != 0:
+            # Central acknowledged a report or replied to time request
+            self.stats.acks_received += 1
+            if request.code in (
+                TuyaBLECode.FUN_RECEIVE_TIME1_REQ,
+                TuyaBLECode.FUN_RECEIVE_TIME2_REQ,
+            ):
+                self.time_replies.append((request.code, request.data))
+            return
+
+        match request.code:
+            case TuyaBLECode.FUN_SENDER_DEVICE_INFO:
+                self._send(
+                    request.code, self._build_device_info(), request.seq_num
+                )
+            case TuyaBLECode.FUN_SENDER_PAIR:
+                local_key = self._protocol.local_key
+                expected = (
+                    self.config.uuid.encode()
+                    + local_key
+                    + self.config.device_id.encode()
+                )
+                result = 0 if request.data.startswith(expected) else 1
+                self._protocol.is_paired = result == 0
+                self._send(request.code, bytes((result,)), request.seq_num)
+            case _ if not self._protocol.is_paired:
+                _LOGGER.debug(
+                    "%s: Ignoring %s before pairing",
+                    self.address,
+                    request.code.name,
+                )
+            case TuyaBLECode.FUN_SENDER_DEVICE_STATUS:
+                self._send(request.code, b"\x00", request.seq_num)
+                self._report_status()
+            case TuyaBLECode.FUN_SENDER_DPS | TuyaBLECode.FUN_SENDER_DPS_V4:
+                if request.code == TuyaBLECode.FUN_SENDER_DPS:
+                    event = self._protocol._parse_datapoints_v3(
+                        time.time(), 0, request.data, 0
+                    )
+                else:
+                    event = self._protocol._parse_datapoints_v4(
+                        time.time(), 0, request.data, 6
+                    )
+                for dp_id, type, value in event.datapoints:
+                    self.datapoints[dp_id] = (type, value)
+                self._send(request.code, b"\x00", request.seq_num)
+                self.report_datapoints(
+                    [dp_id for dp_id, _, _ in event.datapoints]
+                )
+            case _:
+                _LOGGER.debug(
+                    "%s: Not supported %s", self.address, request.code.name
+                )
+
+    def _build_device_info(self) -> bytes:
+        config = self.config
+        srand = secrets.token_bytes(6)
+        auth_key = secrets.token_bytes(32)
+        self._protocol.session_key = hashlib.md5(
+            self._protocol.local_key + srand
+        ).digest()
+        self._protocol.auth_key = auth_key
+        self._protocol._ciphers.clear()
+        return (
+            bytes(
+                (
+                    *config.device_version,
+                    config.protocol_version,
+                    0,
+                    0,
+                    1 if self._is_bound else 0,
+                )
+            )
+            + srand
+            + bytes(config.hardware_version)
+            + auth_key
+        )
+
+
+class TuyaBLESimulator(AbstaractTuyaBLEDeviceManager):
+    """Set of simulated devices, provides their credentials and connections."""
+
+    def __init__(self, seed: int | None = None) -> None:
+        self._rng = random.Random(seed)
+        self._devices: dict[str, TuyaBLESimulatedDevice] = {}
+
+    def add_device(
+        self, config: TuyaBLESimulatorConfig | None = None
+    ) -> TuyaBLESimulatedDevice:
+        if config is None:
+            config = TuyaBLESimulatorConfig()
+        peripheral = TuyaBLESimulatedDevice(
+            config, random.Random(self._rng.getrandbits(32))
+        )
+        self._devices[peripheral.address] = peripheral
+        return peripheral
+
+    @property
+    def devices(self) -> list[TuyaBLESimulatedDevice]:
+        return list(self._devices.values())
+
+    def get_device(self, address: str) -> TuyaBLESimulatedDevice | None:
+        return self._devices.get(address)
+
+    async def get_device_credentials(
+        self,
+        address: str,
+        force_update: bool = False,
+        save_data: bool = False,
+    ) -> TuyaBLEDeviceCredentials | None:
+        if peripheral := self._devices.get(address):
+            return peripheral.credentials
+        return None
+
+    async def establish_connection(
+        self,
+        client_class: type,
+        device: BLEDevice,
+        name: str,
+        disconnected_callback: Callable[[TuyaBLESimulatedClient], None]
+        | None = None,
+        **kwargs,
+    ) -> TuyaBLESimulatedClient:
+        """Drop-in replacement of bleak_retry_connector.establish_connection."""
+        peripheral = self._devices.get(device.address)
+        if peripheral is None:
+            raise BleakNotFoundError("%s: Device not found" % name)
+        return await peripheral.connect(disconnected_callback)
@@ -0,0 +1,336 @@
+"""Load test of a fleet of TuyaBLEDevice instances on simulated devices.
+
+Run from the repository root inside a Home Assistant development environment:
+
+    python -m benchmarks.fleet
+    python -m benchmarks.fleet --devices 500 --duration 60 --callbacks 8
+    python -m benchmarks.fleet --status-frame-datapoints 2 --callback-delay 0
+
+All devices are connected through the in-process simulator, then driven
+with realistic traffic for the given duration: periodic sensor reports
+from every device, status dumps requested by polling and user commands
+sent to random devices. Reported are event loop lag, CPU time spent in
+TuyaBLEDevice._notification_handler per notification and per frame,
+memory allocated per connected device, callbacks fired per initial status
+dump and cost of firing device callbacks to the registered listeners.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from custom_components.tuya_ble.tuya_ble.connection import (
+    TuyaBLEConnectionScheduler,
+    TuyaBLEReconnectPolicy,
+)
+from custom_components.tuya_ble.tuya_ble.const import TuyaBLEDataPointType
+from custom_components.tuya_ble.tuya_ble.tuya_ble import (
+    TuyaBLEDataPoint,
+    TuyaBLEDevice,
+)
+
+from .codec import SEED
+from .device_simulator import (
+    SIMULATOR_ADAPTER,
+    TuyaBLESimulatedDevice,
+    TuyaBLESimulator,
+    TuyaBLESimulatorConfig,
+)
+
+
+class FleetStats:
+    """Measurements collected while the fleet is running."""
+
+    def __init__(self) -> None:
+        self.loop_lag: list[float] = []
+        self.notification_cpu: list[float] = []
+        self.fan_out: list[float] = []
+        self.listeners_called = 0
+        self.command_rtt: list[float] = []
+        self.failed_commands = 0
+        self.failed_polls = 0
+
+
+def instrument(device: TuyaBLEDevice, stats: FleetStats) -> None:
+    """Time notification handling and callbacks of the device."""
+    notification_handler = device._notification_handler
+    fire_callbacks = device._fire_callbacks
+
+    def timed_notification_handler(sender: int, data: bytearray) -> None:
+        start = time.thread_time()
+        notification_handler(sender, data)
+        stats.notification_cpu.append(time.thread_time() - start)
+
+    def timed_fire_callbacks(datapoints: list[TuyaBLEDataPoint]) -> None:
+        start = time.perf_counter()
+        fire_callbacks(datapoints)
+        stats.fan_out.append(time.perf_counter() - start)
+        stats.listeners_called += len(device._callbacks)
+
+    # Bound before connecting, so the client gets the timed handler
+    device._notification_handler = timed_notification_handler
+    device._fire_callbacks = timed_fire_callbacks
+
+
+def make_listener() -> Callable[[list[TuyaBLEDataPoint]], None]:
+    """Listener doing what an entity does: read the values it shows."""
+    state: dict[int, object] = {}
+
+    def listener(datapoints: list[TuyaBLEDataPoint]) -> None:
+        for datapoint in datapoints:
+            state[datapoint.id] = datapoint.value
+
+    return listener
+
+
+async def measure_loop_lag(
+    stats: FleetStats, interval: float, stop: asyncio.Event
+) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        stats.loop_lag.append(loop.time() - start - interval)
+
+
+async def report_periodically(
+    peripheral: TuyaBLESimulatedDevice,
+    rng: random.Random,
+    interval: float,
+    stop: asyncio.Event,
+) -> None:
+    dp_ids = list(peripheral.datapoints)
+    await asyncio.sleep(rng.uniform(0, interval))
+    while not stop.is_set():
+        dp_id = rng.choice(dp_ids)
+        peripheral.set_datapoint(
+            dp_id, TuyaBLEDataPointType.DT_VALUE, rng.getrandbits(16)
+        )
+        await asyncio.sleep(rng.uniform(interval / 2, interval * 1.5))
+
+
+async def poll_periodically(
+    device: TuyaBLEDevice,
+    stats: FleetStats,
+    rng: random.Random,
+    interval: float,
+    stop: asyncio.Event,
+) -> None:
+    await asyncio.sleep(rng.uniform(0, interval))
+    while not stop.is_set():
+        try:
+            await device.update()
+        except Exception:  # noqa: BLE001
+            stats.failed_polls += 1
+        await asyncio.sleep(interval)
+
+
+async def send_commands(
+    devices: list[TuyaBLEDevice],
+    stats: FleetStats,
+    rng: random.Random,
+    rate: float,
+    stop: asyncio.Event,
+) -> None:
+    tasks: set[asyncio.Task] = set()
+
+    async def command(device: TuyaBLEDevice) -> None:
+        start = time.perf_counter()
+        try:
+            if await device.set_datapoints(
+                {1: (TuyaBLEDataPointType.DT_VALUE, rng.getrandbits(16))}
+            ):
+                stats.command_rtt.append(time.perf_counter() - start)
+                return
+        except Exception:  # noqa: BLE001
+            pass
+        stats.failed_commands += 1
+
+    while not stop.is_set():
+        await asyncio.sleep(rng.expovariate(rate))
+        task = asyncio.create_task(command(rng.choice(devices)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+
+
+def percentiles(values: list[float], scale: float, unit: str) -> str:
+    if len(values) < 2:
+        return "no samples"
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return (
+        f"p50 {cuts[49] * scale:9.2f} {unit}"
+        f"  p99 {cuts[98] * scale:9.2f} {unit}"
+        f"  max {max(values) * scale:9.2f} {unit}"
+        f"  ({len(values)} samples)"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(SEED)
+    simulator = TuyaBLESimulator(SEED)
+    scheduler = TuyaBLEConnectionScheduler()
+    scheduler.set_max_connections(SIMULATOR_ADAPTER, args.connect_slots)
+    stats = FleetStats()
+    datapoints = {
+        dp_id: (TuyaBLEDataPointType.DT_VALUE, 0)
+        for dp_id in range(1, args.datapoints + 1)
+    }
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    peripherals: list[TuyaBLESimulatedDevice] = []
+    devices: list[TuyaBLEDevice] = []
+    for _ in range(args.devices):
+        peripheral = simulator.add_device(
+            TuyaBLESimulatorConfig(
+                protocol_version=args.protocol_version,
+                latency=args.latency,
+                jitter=args.jitter,
+                loss=args.loss,
+                datapoints=dict(datapoints),
+                status_frame_datapoints=args.status_frame_datapoints,
+                status_frame_interval=args.status_frame_interval,
+            )
+        )
+        device = TuyaBLEDevice(
+            simulator,
+            peripheral.ble_device,
+            scheduler=scheduler,
+            reconnect_policy=TuyaBLEReconnectPolicy(backoff_base=0.1),
+            connector=simulator.establish_connection,
+            callback_delay=args.callback_delay,
+        )
+        instrument(device, stats)
+        for _ in range(args.callbacks):
+            device.register_callback(make_listener())
+        await device.initialize()
+        peripherals.append(peripheral)
+        devices.append(device)
+    results = await asyncio.gather(
+        *(device.reconnect_and_update() for device in devices),
+        return_exceptions=True,
+    )
+    connect_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    failed = sum(1 for result in results if isinstance(result, BaseException))
+    print(
+        f"connected {args.devices - failed}/{args.devices} devices"
+        f" in {connect_time:.2f} s, {memory / args.devices / 1024:.1f} KiB"
+        " per device"
+    )
+    # Let the last frames of the status dumps arrive and their callbacks fire
+    status_frames = math.ceil(
+        args.datapoints / (args.status_frame_datapoints or args.datapoints)
+    )
+    await asyncio.sleep(
+        status_frames * args.status_frame_interval
+        + args.callback_delay
+        + 2 * (args.latency + args.jitter)
+    )
+    print(
+        f"status dump           {len(stats.fan_out) / args.devices:9.2f}"
+        f" callbacks per device ({status_frames} frames)"
+    )
+
+    # Measure traffic only, not connecting and the initial status dumps
+    stats.notification_cpu.clear()
+    stats.fan_out.clear()
+    stats.listeners_called = 0
+    frames_before = sum(p.stats.frames_sent for p in peripherals)
+
+    stop = asyncio.Event()
+    tasks = [
+        asyncio.create_task(measure_loop_lag(stats, args.lag_interval, stop)),
+        asyncio.create_task(
+            send_commands(devices, stats, rng, args.command_rate, stop)
+        ),
+    ]
+    for peripheral, device in zip(peripherals, devices):
+        device_rng = random.Random(rng.getrandbits(32))
+        tasks.append(
+            asyncio.create_task(
+                report_periodically(
+                    peripheral, device_rng, args.report_interval, stop
+                )
+            )
+        )
+        tasks.append(
+            asyncio.create_task(
+                poll_periodically(
+                    device, stats, device_rng, args.poll_interval, stop
+                )
+            )
+        )
+    cpu_start = time.process_time()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    cpu_time = time.process_time() - cpu_start
+    frames = sum(p.stats.frames_sent for p in peripherals) - frames_before
+
+    await asyncio.gather(*(device.stop() for device in devices))
+
+    notification_cpu = sum(stats.notification_cpu)
+    print(f"process CPU {cpu_time / args.duration * 100:.1f} %")
+    print(f"event loop lag        {percentiles(stats.loop_lag, 1e3, 'ms')}")
+    print(
+        "notification CPU      "
+        f"{percentiles(stats.notification_cpu, 1e6, 'us')}"
+    )
+    if frames:
+        print(
+            f"notification CPU      {notification_cpu / frames * 1e6:9.2f} us"
+            f" per frame ({frames} frames)"
+        )
+    print(f"callbacks fan-out     {percentiles(stats.fan_out, 1e6, 'us')}")
+    if stats.listeners_called:
+        print(
+            f"callbacks fan-out     "
+            f"{sum(stats.fan_out) / stats.listeners_called * 1e6:9.2f} us"
+            f" per listener ({stats.listeners_called} calls)"
+        )
+    print(f"command round-trip    {percentiles(stats.command_rtt, 1e3, 'ms')}")
+    print(
+        f"failed commands {stats.failed_commands}, failed polls"
+        f" {stats.failed_polls}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--callbacks", type=int, default=5)
+    parser.add_argument("--datapoints", type=int, default=10)
+    parser.add_argument("--status-frame-datapoints", type=int, default=3)
+    parser.add_argument("--status-frame-interval", type=float, default=0.005)
+    parser.add_argument("--callback-delay", type=float, default=0.05)
+    parser.add_argument("--protocol-version", type=int, default=3)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--poll-interval", type=float, default=30.0)
+    parser.add_argument("--command-rate", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--connect-slots", type=int, default=10)
+    parser.add_argument("--lag-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""Fuzzing of the frame and datapoint parsers.
+
+Run from the repository root inside a Home Assistant development environment:
+
+    python -m benchmarks.fuzz
+    python -m benchmarks.fuzz --target datapoints_v3 --iterations 200000
+    python -m benchmarks.fuzz --atheris -- -max_total_time=600
+
+Parsers are fed with inputs mutated from a corpus of valid frames, which is
+generated from a fixed seed, so runs are reproducible. Malformed input may
+only raise TuyaBLEDataFormatError, TuyaBLEDataLengthError or
+TuyaBLEDataCRCError, and must be handled within TIME_BASE plus
+TIME_PER_BYTE for every byte of input. The first input which breaks either
+rule is printed and the exit code is 1.
+
+With --atheris the targets run under the coverage-guided atheris fuzzer,
+which has to be installed separately; arguments after -- are passed to
+libFuzzer.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import sys
+import time
+import traceback
+from collections.abc import Callable
+from struct import pack
+
+from custom_components.tuya_ble.tuya_ble.codec import (
+    TuyaBLECipher,
+    calc_crc16,
+    pack_int,
+    unpack_int,
+)
+from custom_components.tuya_ble.tuya_ble.const import (
+    TuyaBLECode,
+    TuyaBLEDataPointType,
+)
+from custom_components.tuya_ble.tuya_ble.exceptions import (
+    TuyaBLEDataCRCError,
+    TuyaBLEDataFormatError,
+    TuyaBLEDataLengthError,
+)
+from custom_components.tuya_ble.tuya_ble.protocol import (
+    TuyaBLEProtocol,
+    encode_datapoint_value,
+)
+
+from .codec import SEED, setup_protocol
+
+EXPECTED_ERRORS = (
+    TuyaBLEDataFormatError,
+    TuyaBLEDataLengthError,
+    TuyaBLEDataCRCError,
+)
+
+# Time allowed for one input, generous enough for a loaded machine
+TIME_BASE = 0.005
+TIME_PER_BYTE = 0.00002
+
+INTERESTING_BYTES = (0x00, 0x01, 0x7F, 0x80, 0xFF)
+
+
+def make_protocol() -> TuyaBLEProtocol:
+    protocol = TuyaBLEProtocol("fuzz")
+    setup_protocol(protocol)
+    return protocol
+
+
+def encrypt_frame(cipher: TuyaBLECipher, raw: bytes) -> bytes:
+    """Encrypt plaintext of frame with the session key, as the device does."""
+    raw = raw + bytes(-len(raw) % 16)
+    iv = bytes(16)
+    encrypted = bytes((5,)) + iv + cipher.encrypt(iv, raw)
+    return pack_int(0) + pack_int(len(encrypted)) + b"\x30" + encrypted
+
+
+def fix_crc(raw: bytes) -> bytes:
+    """Recompute CRC, so mutated frames get to parsing of their data."""
+    if len(raw) < 12:
+        return raw
+    end = int.from_bytes(raw[10:12], "big") + 12
+    if len(raw) < end + 2:
+        return raw
+    return raw[:end] + pack(">H", calc_crc16(raw[:end])) + raw[end + 2:]  # fmt: skip
+
+
+def make_datapoints(rng: random.Random, header_format: str) -> bytes:
+    data = bytearray()
+    for dp_id in range(1, rng.randint(1, 6)):
+        type = rng.choice(list(TuyaBLEDataPointType))
+        match type:
+            case TuyaBLEDataPointType.DT_BOOL:
+                value = rng.random() < 0.5
+            case TuyaBLEDataPointType.DT_VALUE:
+                value = rng.randint(-(2**31), 2**31 - 1)
+            case TuyaBLEDataPointType.DT_ENUM:
+                value = rng.randint(0, 0x1FFFF)
+            case TuyaBLEDataPointType.DT_STRING:
+                value = "value %s" % rng.getrandbits(16)
+            case _:
+                value = rng.randbytes(rng.randint(0, 8))
+        raw_value = encode_datapoint_value(type, value)
+        data += pack(header_format, dp_id, type.value, len(raw_value))
+        data += raw_value
+    return bytes(data)
+
+
+def make_frame_data(rng: random.Random, code: TuyaBLECode) -> bytes:
+    """Data of a valid frame of given code sent by the device."""
+    timestamp = pack(">BI", 1, rng.getrandbits(31))
+    match code:
+        case TuyaBLECode.FUN_SENDER_DEVICE_INFO:
+            return rng.randbytes(46)
+        case TuyaBLECode.FUN_SENDER_PAIR | TuyaBLECode.FUN_SENDER_DEVICE_STATUS:
+            return bytes((rng.choice((0, 1, 2)),))
+        case TuyaBLECode.FUN_RECEIVE_DP:
+            return make_datapoints(rng, ">BBB")
+        case TuyaBLECode.FUN_RECEIVE_SIGN_DP:
+            return pack(">HB", 1, 0) + make_datapoints(rng, ">BBB")
+        case TuyaBLECode.FUN_RECEIVE_TIME_DP:
+            return b"\x00" + b"1700000000000" + make_datapoints(rng, ">BBB")
+        case TuyaBLECode.FUN_RECEIVE_SIGN_TIME_DP:
+            return pack(">HB", 1, 0) + timestamp + make_datapoints(rng, ">BBB")
+        case TuyaBLECode.FUN_RECEIVE_DP_V4:
+            return pack(">BIBBB", 0, 1, 0, 0, 0) + make_datapoints(rng, ">BBH")
+        case TuyaBLECode.FUN_RECEIVE_TIME_DP_V4:
+            return (
+                pack(">BIBBB", 0, 1, 0, 0, 0)
+                + timestamp
+                + make_datapoints(rng, ">BBH")
+            )
+        case _:
+            return b""
+
+
+def make_raw_frame(rng: random.Random, code: TuyaBLECode) -> bytes:
+    data = make_frame_data(rng, code)
+    raw = pack(">IIHH", rng.getrandbits(16), rng.choice((0, 1)), code.value, len(data))
+    raw += data
+    return raw + pack(">H", calc_crc16(raw))
+
+
+def build_corpus(rng: random.Random, target: str) -> list[bytes]:
+    codes = list(TuyaBLECode)
+    match target:
+        case "int":
+            return [pack_int(rng.getrandbits(bits)) for bits in (0, 7, 14, 21, 28)]
+        case "timestamp":
+            return [b"\x001700000000000", pack(">BI", 1, 1700000000)]
+        case "datapoints_v3":
+            return [make_datapoints(rng, ">BBB") for _ in range(8)]
+        case "datapoints_v4":
+            return [make_datapoints(rng, ">BBH") for _ in range(8)]
+        case "command":
+            # Code of the frame is the first two bytes of the input
+            return [
+                pack(">H", code.value) + make_frame_data(rng, code)
+                for code in codes
+            ]
+        case "frame":
+            return [make_raw_frame(rng, code) for code in codes]
+        case "notifications":
+            protocol = make_protocol()
+            protocol.gatt_mtu = rng.choice((20, 64))
+            return [
+                b"".join(
+                    pack_int(len(packet)) + packet
+                    for packet in protocol.build_packets(
+                        1, code, make_frame_data(rng, code), 1
+                    )
+                )
+                for code in codes
+            ]
+    raise ValueError(target)
+
+
+def split_notifications(data: bytes) -> list[bytes]:
+    """Split input into notifications, each one prefixed with its length."""
+    packets = []
+    pos = 0
+    while pos < len(data):
+        try:
+            length, pos = unpack_int(data, pos)
+        except TuyaBLEDataFormatError:
+            break
+        packets.append(data[pos:pos + length])  # fmt: skip
+        pos += length
+    return packets
+
+
+def build_targets() -> dict[str, Callable[[bytes], object]]:
+    protocol = make_protocol()
+    cipher = TuyaBLECipher(protocol.session_key)
+
+    def parse_int(data: bytes) -> object:
+        return unpack_int(data, 0)
+
+    def parse_timestamp(data: bytes) -> object:
+        return protocol._parse_timestamp(data, 0)
+
+    def parse_datapoints_v3(data: bytes) -> object:
+        return protocol._parse_datapoints_v3(0.0, 0, data, 0)
+
+    def parse_datapoints_v4(data: bytes) -> object:
+        return protocol._parse_datapoints_v4(0.0, 0, data, 0)
+
+    def handle_command(data: bytes) -> object:
+        if len(data) < 2:
+            return None
+        try:
+            code = TuyaBLECode(int.from_bytes(data[:2], "big"))
+        except ValueError:
+            return None
+        setup_protocol(protocol)
+        return protocol._handle_command_or_response(1, 1, code, data[2:])
+
+    def parse_frame(data: bytes) -> object:
+        setup_protocol(protocol)
+        protocol.reset()
+        return protocol.receive_data(encrypt_frame(cipher, fix_crc(data)))
+
+    def receive_notifications(data: bytes) -> object:
+        setup_protocol(protocol)
+        protocol.reset()
+        for packet in split_notifications(data):
+            try:
+                protocol.receive_data(packet)
+            except EXPECTED_ERRORS:
+                pass
+
+    return {
+        "int": parse_int,
+        "timestamp": parse_timestamp,
+        "datapoints_v3": parse_datapoints_v3,
+        "datapoints_v4": parse_datapoints_v4,
+        "command": handle_command,
+        "frame": parse_frame,
+        "notifications": receive_notifications,
+    }
+
+
+def mutate(rng: random.Random, data: bytes, corpus: list[bytes]) -> bytes:
+    result = bytearray(data)
+    for _ in range(rng.randint(1, 4)):
+        pos = rng.randint(0, len(result))
+        match rng.randrange(7):
+            case 0 if result:
+                result[pos % len(result)] ^= 1 << rng.randrange(8)
+            case 1 if result:
+                result[pos % len(result)] = rng.choice(INTERESTING_BYTES)
+            case 2:
+                result[pos:pos] = rng.randbytes(rng.randint(1, 8))
+            case 3:
+                del result[pos:pos + rng.randint(1, 8)]  # fmt: skip
+            case 4:
+                del result[pos:]
+            case 5:
+                other = rng.choice(corpus)
+                result[pos:] = other[rng.randint(0, len(other)):]
+            case _:
+                result[pos:pos] = bytes((rng.choice(INTERESTING_BYTES),)) * rng.randint(1, 32)
+    return bytes(result)
+
+
+def check(target: Callable[[bytes], object], data: bytes) -> str | None:
+    """Run target on input, returns description of the failure."""
+    start = time.perf_counter()
+    try:
+        target(data)
+    except EXPECTED_ERRORS:
+        pass
+    except Exception:  # noqa: BLE001
+        return traceback.format_exc()
+    elapsed = time.perf_counter() - start
+    if elapsed > TIME_BASE + TIME_PER_BYTE * len(data):
+        return "took %.1f ms for %s bytes" % (elapsed * 1e3, len(data))
+    return None
+
+
+def run_random(args: argparse.Namespace, targets: list[str]) -> int:
+    all_targets = build_targets()
+    for name in targets:
+        rng = random.Random(SEED)
+        corpus = build_corpus(rng, name)
+        target = all_targets[name]
+        # Warm up, first calls pay for lazy initialization
+        for data in corpus:
+            check(target, data)
+        start = time.perf_counter()
+        for iteration in range(args.iterations):
+            data = mutate(rng, rng.choice(corpus), corpus)
+            if failure := check(target, data):
+                print(f"{name}: input {data.hex()} failed at iteration {iteration}")
+                print(failure)
+                return 1
+            if rng.random() < 0.01 and len(corpus) < 1000:
+                corpus.append(data)
+        print(
+            f"{name:14} {args.iterations} inputs in"
+            f" {time.perf_counter() - start:.1f} s, no failures"
+        )
+    return 0
+
+
+def run_atheris(args: argparse.Namespace, targets: list[str]) -> int:
+    try:
+        import atheris  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        print("atheris is not installed: pip install atheris", file=sys.stderr)
+        return 2
+
+    all_targets = build_targets()
+    selected = [all_targets[name] for name in targets]
+
+    def test_one_input(data: bytes) -> None:
+        # First byte selects the target when several are fuzzed
+        if not data:
+            return
+        target = selected[data[0] % len(selected)]
+        if failure := check(target, data[1:]):
+            raise AssertionError(failure)
+
+    atheris.instrument_all()
+    atheris.Setup([sys.argv[0], *args.libfuzzer_args], test_one_input)
+    atheris.Fuzz()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--target", action="append", choices=sorted(build_targets())
+    )
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--atheris", action="store_true")
+    parser.add_argument("libfuzzer_args", nargs="*")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    targets = args.target or list(build_targets())
+    if args.atheris:
+        return run_atheris(args, targets)
+    return run_random(args, targets)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
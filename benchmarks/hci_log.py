@@ -0,0 +1,306 @@
+"""Import of Tuya BLE traffic from btsnoop HCI logs.
+
+Android "Bluetooth HCI snoop log" and BlueZ btmon captures are read one
+record at a time. ACL data is reassembled into L2CAP frames, and ATT
+writes to CHARACTERISTIC_WRITE and notifications of CHARACTERISTIC_NOTIFY
+are turned into capture records, which are decoded by
+TuyaBLECaptureDecoder. Handles of both characteristics are learned from
+characteristic discovery in the log, or can be given when the log does not
+include it. Only reassembly buffers are kept, so memory does not grow with
+the size of the log. Used by the btsnoop decoder only and is not shipped
+with the integration.
+"""
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from struct import calcsize, unpack, unpack_from
+from typing import BinaryIO
+from uuid import UUID
+
+from custom_components.tuya_ble.tuya_ble.capture import (
+    TuyaBLECaptureRecord,
+    TuyaBLECaptureRecordType,
+)
+from custom_components.tuya_ble.tuya_ble.const import (
+    CHARACTERISTIC_NOTIFY,
+    CHARACTERISTIC_WRITE,
+)
+from custom_components.tuya_ble.tuya_ble.exceptions import (
+    TuyaBLEDataFormatError,
+    TuyaBLEDataLengthError,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+BTSNOOP_MAGIC = b"btsnoop\x00"
+BTSNOOP_HEADER_FORMAT = ">8sII"
+BTSNOOP_RECORD_FORMAT = ">IIIIq"
+BTSNOOP_RECORD_SIZE = calcsize(BTSNOOP_RECORD_FORMAT)
+# Microseconds between 0000-01-01 and 1970-01-01
+BTSNOOP_EPOCH_DELTA = 0x00DCDDB30F2F8000
+
+BTSNOOP_DATALINK_H1 = 1001
+BTSNOOP_DATALINK_H4 = 1002
+BTSNOOP_DATALINK_MONITOR = 2001
+
+HCI_COMMAND_PKT = 0x01
+HCI_ACL_PKT = 0x02
+HCI_EVENT_PKT = 0x04
+
+MONITOR_EVENT_PKT = 3
+MONITOR_ACL_TX_PKT = 4
+MONITOR_ACL_RX_PKT = 5
+
+HCI_EV_DISCONN_COMPLETE = 0x05
+HCI_EV_LE_META = 0x3E
+HCI_EV_LE_CONN_COMPLETE = 0x01
+HCI_EV_LE_ENHANCED_CONN_COMPLETE = 0x0A
+
+L2CAP_CID_ATT = 0x0004
+# Larger L2CAP frames are not ATT traffic of a Tuya device
+L2CAP_MAX_LENGTH = 0xFFFF
+
+ATT_OP_READ_BY_TYPE_RSP = 0x09
+ATT_OP_WRITE_REQ = 0x12
+ATT_OP_WRITE_CMD = 0x52
+ATT_OP_HANDLE_VALUE_NTF = 0x1B
+ATT_OP_HANDLE_VALUE_IND = 0x1D
+
+
+def _uuid_forms(uuid: str) -> tuple[bytes, bytes]:
+    """Return 16-bit and 128-bit little endian form of the Bluetooth UUID."""
+    raw = UUID(uuid).bytes
+    return (raw[2:4][::-1], raw[::-1])
+
+
+_WRITE_UUIDS = _uuid_forms(CHARACTERISTIC_WRITE)
+_NOTIFY_UUIDS = _uuid_forms(CHARACTERISTIC_NOTIFY)
+
+
+@dataclass
+class _TuyaBLEHciConnection:
+    address: str | None = None
+    write_handle: int | None = None
+    notify_handle: int | None = None
+    # L2CAP frames being reassembled, by direction
+    buffers: dict[bool, bytearray] = field(default_factory=dict)
+    expected: dict[bool, int] = field(default_factory=dict)
+
+
+class TuyaBLEHciLogReader:
+    """Streams capture records of a Tuya device out of a btsnoop log.
+
+    With address given only connections to that device are read. Handles
+    override those learned from characteristic discovery; when no handle
+    is known all writes and notifications are passed to the decoder.
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        address: str | None = None,
+        write_handle: int | None = None,
+        notify_handle: int | None = None,
+    ) -> None:
+        self._file = file
+        self._address = address.upper() if address else None
+        self._write_handle = write_handle
+        self._notify_handle = notify_handle
+        self._connections: dict[int, _TuyaBLEHciConnection] = {}
+        self.records = 0
+        self.truncated = 0
+
+    def __iter__(self) -> Iterator[TuyaBLECaptureRecord]:
+        magic, version, datalink = unpack(
+            BTSNOOP_HEADER_FORMAT,
+            self._read(calcsize(BTSNOOP_HEADER_FORMAT)),
+        )
+        if magic != BTSNOOP_MAGIC or version != 1:
+            raise TuyaBLEDataFormatError()
+        if datalink not in (
+            BTSNOOP_DATALINK_H1,
+            BTSNOOP_DATALINK_H4,
+            BTSNOOP_DATALINK_MONITOR,
+        ):
+            raise TuyaBLEDataFormatError()
+
+        while header := self._file.read(BTSNOOP_RECORD_SIZE):
+            if len(header) < BTSNOOP_RECORD_SIZE:
+                raise TuyaBLEDataLengthError()
+            original_length, length, flags, _, timestamp = unpack(
+                BTSNOOP_RECORD_FORMAT, header
+            )
+            data = self._read(length)
+            self.records += 1
+            if length < original_length:
+                # Snoop log may keep only headers of packets
+                self.truncated += 1
+                continue
+            timestamp = (timestamp - BTSNOOP_EPOCH_DELTA) / 1000000
+            yield from self._handle_packet(timestamp, datalink, flags, data)
+
+    def _read(self, length: int) -> bytes:
+        data = self._file.read(length)
+        if len(data) < length:
+            raise TuyaBLEDataLengthError()
+        return data
+
+    def _handle_packet(
+        self, timestamp: float, datalink: int, flags: int, data: bytes
+    ) -> Iterator[TuyaBLECaptureRecord]:
+        if datalink == BTSNOOP_DATALINK_H4:
+            if not data:
+                return
+            packet_type = data[0]
+            data = data[1:]
+            received = bool(flags & 0x01)
+        elif datalink == BTSNOOP_DATALINK_H1:
+            if flags & 0x02:
+                packet_type = HCI_EVENT_PKT if flags & 0x01 else HCI_COMMAND_PKT
+            else:
+                packet_type = HCI_ACL_PKT
+            received = bool(flags & 0x01)
+        else:
+            opcode = flags & 0xFFFF
+            if opcode == MONITOR_EVENT_PKT:
+                packet_type = HCI_EVENT_PKT
+            elif opcode in (MONITOR_ACL_TX_PKT, MONITOR_ACL_RX_PKT):
+                packet_type = HCI_ACL_PKT
+            else:
+                return
+            received = opcode != MONITOR_ACL_TX_PKT
+
+        if packet_type == HCI_EVENT_PKT:
+            yield from self._handle_event(timestamp, data)
+        elif packet_type == HCI_ACL_PKT:
+            yield from self._handle_acl(timestamp, received, data)
+
+    def _handle_event(
+        self, timestamp: float, data: bytes
+    ) -> Iterator[TuyaBLECaptureRecord]:
+        if len(data) < 2:
+            return
+        event = data[0]
+        if event == HCI_EV_LE_META and len(data) >= 14:
+            if data[2] not in (
+                HCI_EV_LE_CONN_COMPLETE,
+                HCI_EV_LE_ENHANCED_CONN_COMPLETE,
+            ):
+                return
+            status, handle = unpack_from("<BH", data, 3)
+            if status != 0:
+                return
+            address = ":".join("%02X" % byte for byte in data[13:7:-1])
+            handle &= 0x0FFF
+            self._connections[handle] = _TuyaBLEHciConnection(address)
+            if self._is_selected(handle):
+                yield TuyaBLECaptureRecord(
+                    timestamp, TuyaBLECaptureRecordType.CONNECTED, b""
+                )
+        elif event == HCI_EV_DISCONN_COMPLETE and len(data) >= 6:
+            status, handle = unpack_from("<BH", data, 2)
+            if status != 0:
+                return
+            handle &= 0x0FFF
+            selected = self._is_selected(handle)
+            self._connections.pop(handle, None)
+            if selected:
+                yield TuyaBLECaptureRecord(
+                    timestamp, TuyaBLECaptureRecordType.DISCONNECTED, b""
+                )
+
+    def _is_selected(self, handle: int) -> bool:
+        if self._address is None:
+            return True
+        connection = self._connections.get(handle)
+        return connection is not None and connection.address == self._address
+
+    def _handle_acl(
+        self, timestamp: float, received: bool, data: bytes
+    ) -> Iterator[TuyaBLECaptureRecord]:
+        if len(data) < 4:
+            return
+        handle, length = unpack_from("<HH", data)
+        boundary = (handle >> 12) & 0x03
+        handle &= 0x0FFF
+        if not self._is_selected(handle):
+            return
+        connection = self._connections.get(handle)
+        if connection is None:
+            # Log started while the device was connected
+            connection = _TuyaBLEHciConnection()
+            self._connections[handle] = connection
+        fragment = data[4:4 + length]  # fmt: skip
+
+        if boundary != 0x01:
+            # First fragment of L2CAP frame
+            if len(fragment) < 4:
+                return
+            (l2cap_length,) = unpack_from("<H", fragment)
+            connection.buffers[received] = bytearray(fragment)
+            connection.expected[received] = l2cap_length + 4
+        else:
+            buffer = connection.buffers.get(received)
+            if buffer is None:
+                return
+            buffer += fragment
+            if len(buffer) > L2CAP_MAX_LENGTH:
+                del connection.buffers[received]
+                return
+
+        buffer = connection.buffers[received]
+        if len(buffer) < connection.expected[received]:
+            return
+        del connection.buffers[received]
+        _, cid = unpack_from("<HH", buffer)
+        if cid == L2CAP_CID_ATT:
+            yield from self._handle_att(
+                timestamp, received, connection, bytes(buffer[4:])
+            )
+
+    def _handle_att(
+        self,
+        timestamp: float,
+        received: bool,
+        connection: _TuyaBLEHciConnection,
+        pdu: bytes,
+    ) -> Iterator[TuyaBLECaptureRecord]:
+        if len(pdu) < 3:
+            return
+        opcode = pdu[0]
+        if opcode == ATT_OP_READ_BY_TYPE_RSP and received:
+            self._handle_characteristics(connection, pdu)
+            return
+        (handle,) = unpack_from("<H", pdu, 1)
+        if opcode in (ATT_OP_WRITE_CMD, ATT_OP_WRITE_REQ) and not received:
+            write_handle = self._write_handle or connection.write_handle
+            if write_handle is None or handle == write_handle:
+                yield TuyaBLECaptureRecord(
+                    timestamp, TuyaBLECaptureRecordType.SENT, pdu[3:]
+                )
+        elif opcode in (ATT_OP_HANDLE_VALUE_NTF, ATT_OP_HANDLE_VALUE_IND) and (
+            received
+        ):
+            notify_handle = self._notify_handle or connection.notify_handle
+            if notify_handle is None or handle == notify_handle:
+                yield TuyaBLECaptureRecord(
+                    timestamp, TuyaBLECaptureRecordType.RECEIVED, pdu[3:]
+                )
+
+    def _handle_characteristics(
+        self, connection: _TuyaBLEHciConnection, pdu: bytes
+    ) -> None:
+        """Learn value handles from response to characteristic discovery."""
+        entry_length = pdu[1]
+        # Declaration handle, properties, value handle and 16 or 128-bit UUID
+        if entry_length not in (7, 21):
+            return
+        for pos in range(2, len(pdu) - entry_length + 1, entry_length):
+            (value_handle,) = unpack_from("<H", pdu, pos + 3)
+            uuid = pdu[pos + 5:pos + entry_length]  # fmt: skip
+            if uuid in _WRITE_UUIDS:
+                connection.write_handle = value_handle
+            elif uuid in _NOTIFY_UUIDS:
+                connection.notify_handle = value_handle
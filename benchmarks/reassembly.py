@@ -0,0 +1,110 @@
+"""Benchmark of reassembly and decryption of fragmented notifications.
+
+Run from the repository root inside a Home Assistant development environment:
+
+    python -m benchmarks.reassembly
+
+Frames of several sizes are split into notifications and replayed through
+TuyaBLEDevice._notification_handler and through the reference implementation
+which grows a bytearray and slices it before decryption. For every case the
+time per frame and the peak of memory allocated while handling one frame are
+reported.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from struct import unpack
+
+from Crypto.Cipher import AES
+
+from custom_components.tuya_ble.tuya_ble.codec import calc_crc16, unpack_int
+from custom_components.tuya_ble.tuya_ble.const import TuyaBLECode
+from custom_components.tuya_ble.tuya_ble.tuya_ble import TuyaBLEDevice
+
+from .codec import SEED, make_device
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def make_reference_handler(device: TuyaBLEDevice) -> Callable[[bytes], None]:
+    """Notification handling as it was done with growing bytearray."""
+    state = {"buffer": bytearray(), "length": 0}
+
+    def parse_input(buffer: bytearray) -> bytes:
+        key = device.protocol._get_key(buffer[0])
+        iv = buffer[1:17]
+        encrypted = buffer[17:]
+        raw = AES.new(key, AES.MODE_CBC, iv).decrypt(encrypted)
+        _, _, _, length = unpack(">IIHH", raw[:12])
+        data_end_pos = length + 12
+        calc_crc16(raw[:data_end_pos])
+        unpack(">H", raw[data_end_pos:data_end_pos + 2])  # fmt: skip
+        return raw[12:data_end_pos]
+
+    def handler(data: bytes) -> None:
+        _LOGGER.debug("%s: Packet received: %s", device.address, data.hex())
+        packet_num, pos = unpack_int(data, 0)
+        if packet_num == 0:
+            state["buffer"] = bytearray()
+            state["length"], pos = unpack_int(data, pos)
+            pos += 1
+        state["buffer"] += data[pos:]
+        if len(state["buffer"]) == state["length"]:
+            parse_input(state["buffer"])
+
+    return handler
+
+
+def replay(handler: Callable[[bytes], None], packets: list[bytes]) -> None:
+    for packet in packets:
+        handler(packet)
+
+
+def peak_memory(func: Callable[[], None]) -> int:
+    func()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(SEED)
+    device = make_device()
+    reference = make_reference_handler(device)
+    current = lambda packet: device._notification_handler(0, packet)  # noqa: E731
+
+    for size in (16, 128, 512, 2048):
+        # Code which has no side effects on receive, to measure input path only
+        packets = device.protocol.build_packets(
+            1, TuyaBLECode.FUN_SENDER_OTA_START, rng.randbytes(size), 1
+        )
+        for name, handler in (("reference", reference), ("current", current)):
+            func = lambda: replay(handler, packets)  # noqa: E731
+            best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+            print(
+                f"{size:5} bytes {len(packets):4} fragments {name:10}"
+                f" {best / args.number * 1e6:9.2f} us"
+                f" {peak_memory(func):7} bytes peak"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Latency benchmark of TuyaBLEDevice against the in-process simulator.
+
+Run from the repository root inside a Home Assistant development environment:
+
+    python -m benchmarks.simulator
+    python -m benchmarks.simulator --latency 0.03 --loss 0.02 --mtu 185
+
+For every round the device is connected and polled until the first
+datapoint arrives, then a datapoint is set and the round-trip is timed, and
+finally the simulated device drops the connection and the time until the
+device is connected again is measured. Median and worst times of all rounds
+are reported.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+
+from custom_components.tuya_ble.tuya_ble.connection import (
+    TuyaBLEConnectionScheduler,
+    TuyaBLEReconnectPolicy,
+)
+from custom_components.tuya_ble.tuya_ble.const import TuyaBLEDataPointType
+from custom_components.tuya_ble.tuya_ble.tuya_ble import TuyaBLEDevice
+
+from .codec import SEED
+from .device_simulator import (
+    TuyaBLESimulator,
+    TuyaBLESimulatorConfig,
+)
+
+
+async def run_round(
+    simulator: TuyaBLESimulator, config: TuyaBLESimulatorConfig
+) -> dict[str, float]:
+    peripheral = simulator.add_device(config)
+    device = TuyaBLEDevice(
+        simulator,
+        peripheral.ble_device,
+        scheduler=TuyaBLEConnectionScheduler(),
+        reconnect_policy=TuyaBLEReconnectPolicy(backoff_base=0.05),
+        connector=simulator.establish_connection,
+    )
+    first_datapoint = asyncio.Event()
+    device.register_callback(lambda datapoints: first_datapoint.set())
+    await device.initialize()
+
+    result: dict[str, float] = {}
+    start = time.perf_counter()
+    await device.reconnect_and_update()
+    await first_datapoint.wait()
+    result["connect to first datapoint"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await device.set_datapoints({1: (TuyaBLEDataPointType.DT_VALUE, 1)})
+    result["command round-trip"] = time.perf_counter() - start
+
+    reconnected = asyncio.Event()
+    device.register_connected_callback(reconnected.set)
+    start = time.perf_counter()
+    peripheral.disconnect()
+    await reconnected.wait()
+    result["reconnect"] = time.perf_counter() - start
+
+    await device.stop()
+    return result
+
+
+async def run(args: argparse.Namespace) -> None:
+    simulator = TuyaBLESimulator(SEED)
+    results: dict[str, list[float]] = {}
+    for _ in range(args.rounds):
+        config = TuyaBLESimulatorConfig(
+            protocol_version=args.protocol_version,
+            latency=args.latency,
+            jitter=args.jitter,
+            loss=args.loss,
+            gatt_mtu=args.mtu,
+            datapoints={1: (TuyaBLEDataPointType.DT_VALUE, 0)},
+        )
+        round_result = await asyncio.wait_for(
+            run_round(simulator, config), args.timeout
+        )
+        for name, value in round_result.items():
+            results.setdefault(name, []).append(value)
+
+    for name, values in results.items():
+        print(
+            f"{name:28} median {statistics.median(values) * 1e3:9.2f} ms"
+            f"  max {max(values) * 1e3:9.2f} ms"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--protocol-version", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--mtu", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
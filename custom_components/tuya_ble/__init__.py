@@ -12,10 +12,11 @@ from homeassistant.const import CONF_ADDRESS, EVENT_HOMEASSISTANT_STOP, Platform
 from homeassistant.core import Event, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
 
-from .tuya_ble import TuyaBLEDevice
+from .tuya_ble import TuyaBLEDevice, connection_scheduler
+from .tuya_ble.connection import get_adapter
 
 from .cloud import HASSTuyaBLEDeviceManager
-from .const import DOMAIN
+from .const import DATAPOINTS_CALLBACK_DELAY, DOMAIN
 from .devices import TuyaBLECoordinator, TuyaBLEData, get_device_product_info
 
 PLATFORMS: list[Platform] = [
@@ -33,6 +34,27 @@ PLATFORMS: list[Platform] = [
 _LOGGER = logging.getLogger(__name__)
 
 
+def _get_connection_slots(hass: HomeAssistant, address: str) -> int | None:
+    """Return number of connection slots of the adapter or proxy, if known."""
+    # Source is the adapter address or the proxy the device was last seen
+    # through, local adapters are named by BlueZ path (hci0) in the device
+    # details and would not be found by it
+    service_info = bluetooth.async_last_service_info(hass, address, True)
+    scanner = service_info and bluetooth.async_scanner_by_source(
+        hass, service_info.source
+    )
+    # Allocations are reported by newer versions of the bluetooth stack
+    get_allocations = getattr(scanner, "get_allocations", None)
+    if get_allocations and (allocations := get_allocations()) and allocations.slots:
+        return allocations.slots
+    _LOGGER.debug(
+        "%s: Connection slots of the adapter are not known, using default"
+        " limit",
+        address,
+    )
+    return None
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Tuya BLE from a config entry."""
     address: str = entry.data[CONF_ADDRESS]
@@ -43,8 +65,13 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         raise ConfigEntryNotReady(
             f"Could not find Tuya BLE device with address {address}"
         )
+    adapter = get_adapter(ble_device)
+    if slots := _get_connection_slots(hass, ble_device.address):
+        connection_scheduler.set_max_connections(adapter, slots)
     manager = HASSTuyaBLEDeviceManager(hass, entry.options.copy())
-    device = TuyaBLEDevice(manager, ble_device)
+    device = TuyaBLEDevice(
+        manager, ble_device, callback_delay=DATAPOINTS_CALLBACK_DELAY
+    )
     await device.initialize()
     product_info = get_device_product_info(device)
 
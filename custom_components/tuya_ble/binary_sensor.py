@@ -44,6 +44,8 @@ class TuyaBLEBinarySensorMapping:
     #coefficient: float = 1.0
     #icons: list[str] | None = None
     is_available: TuyaBLEBinarySensorIsAvailable = None
+    # Other datapoints read by is_available or getter
+    depends_on: tuple[int, ...] = ()
 
 
 @dataclass
@@ -130,6 +132,8 @@ class TuyaBLEBinarySensor(TuyaBLEEntity, BinarySensorEntity):
     ) -> None:
         super().__init__(hass, coordinator, device, product, mapping.description)
         self._mapping = mapping
+        if mapping.dp_id >= 0:
+            self._set_datapoint_ids(mapping.dp_id, *mapping.depends_on)
 
     @callback
     def _handle_coordinator_update(self) -> None:
@@ -165,7 +169,7 @@ class TuyaBLEBinarySensor(TuyaBLEEntity, BinarySensorEntity):
                 else:
                     self._attr_native_value = datapoint.value
                 '''
-        self.async_write_ha_state()
+        self._async_write_ha_state_if_changed()
 
     async def async_added_to_hass(self) -> None:
         """Set up device update callbacks."""
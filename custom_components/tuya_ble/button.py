@@ -41,6 +41,8 @@ class TuyaBLEButtonMapping:
     force_add: bool = True
     dp_type: TuyaBLEDataPointType | None = None
     is_available: TuyaBLEButtonIsAvailable = None
+    # Other datapoints read by is_available or getter
+    depends_on: tuple[int, ...] = ()
 
 
 def is_fingerbot_in_push_mode(self: TuyaBLEButton, product: TuyaBLEProductInfo) -> bool:
@@ -139,6 +141,7 @@ mapping: dict[str, TuyaBLECategoryButtonMapping] = {
                         (dp := self._device.datapoints[101]) is not None
                         and (dp.value if not isinstance(dp.value, bytes) else int.from_bytes(dp.value[:1], "big")) == 0
                     ),
+                    depends_on=(101,),
                 ),
                 TuyaBLEButtonMapping(
                     dp_id=2,
@@ -151,6 +154,7 @@ mapping: dict[str, TuyaBLECategoryButtonMapping] = {
                         (dp := self._device.datapoints[102]) is not None
                         and (dp.value if not isinstance(dp.value, bytes) else int.from_bytes(dp.value[:1], "big")) == 0
                     ),
+                    depends_on=(102,),
                 ),
             ],
         },
@@ -211,6 +215,7 @@ class TuyaBLEButton(TuyaBLEEntity, ButtonEntity):
     ) -> None:
         super().__init__(hass, coordinator, device, product, mapping.description)
         self._mapping = mapping
+        self._set_datapoint_ids(mapping.dp_id, *mapping.depends_on)
 
     def press(self) -> None:
         """Press the button."""
@@ -222,9 +227,9 @@ class TuyaBLEButton(TuyaBLEEntity, ButtonEntity):
         if datapoint:
             if getattr(self._product, "lock", False):  # Safely check if 'lock' exists and is True
                 #Lock needs true to activate lock/unlock commands
-                self._hass.create_task(datapoint.set_value(True))
+                self.send_datapoint_value(datapoint, True)
             else:
-                self._hass.create_task(datapoint.set_value(not bool(datapoint.value)))
+                self.send_datapoint_value(datapoint, not bool(datapoint.value))
 
     @property
     def available(self) -> bool:
@@ -248,11 +253,13 @@ class TuyaBLEActionButton(TuyaBLEEntity, ButtonEntity):
     ) -> None:
         super().__init__(hass, coordinator, device, product, mapping.description)
         self._mapping = mapping
+        # No datapoints of its own, availability depends on the connection
+        self._set_datapoint_ids()
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self.async_write_ha_state()
+        self._async_write_ha_state_if_changed()
     
     async def async_added_to_hass(self) -> None:
         """Set up device update callbacks."""
@@ -163,6 +163,15 @@ class TuyaBLEClimate(TuyaBLEEntity, ClimateEntity):
         self._attr_hvac_mode = HVACMode.HEAT
         self._attr_preset_mode = PRESET_NONE
         self._attr_hvac_action = HVACAction.HEATING
+        self._set_datapoint_ids(
+            mapping.hvac_mode_dp_id,
+            mapping.hvac_switch_dp_id,
+            mapping.current_temperature_dp_id,
+            mapping.target_temperature_dp_id,
+            mapping.current_humidity_dp_id,
+            mapping.target_humidity_dp_id,
+            *(mapping.preset_mode_dp_ids or {}).values(),
+        )
 
         if mapping.hvac_mode_dp_id and mapping.hvac_modes:
             self._attr_hvac_modes = mapping.hvac_modes
@@ -253,7 +262,7 @@ class TuyaBLEClimate(TuyaBLEEntity, ClimateEntity):
         except:
             pass
 
-        self.async_write_ha_state()
+        self._async_write_ha_state_if_changed()
 
     async def async_set_temperature(self, **kwargs) -> None:
         """Set new target temperature."""
@@ -268,7 +277,7 @@ class TuyaBLEClimate(TuyaBLEEntity, ClimateEntity):
                 int_value,
             )
             if datapoint:
-                self._hass.create_task(datapoint.set_value(int_value))
+                self.send_datapoint_value(datapoint, int_value)
 
     async def async_set_humidity(self, humidity: int) -> None:
         """Set new target humidity."""
@@ -280,7 +289,7 @@ class TuyaBLEClimate(TuyaBLEEntity, ClimateEntity):
                 int_value,
             )
             if datapoint:
-                self._hass.create_task(datapoint.set_value(int_value))
+                self.send_datapoint_value(datapoint, int_value)
 
     async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
         """Set new target hvac mode."""
@@ -296,7 +305,7 @@ class TuyaBLEClimate(TuyaBLEEntity, ClimateEntity):
                 int_value,
             )
             if datapoint:
-                self._hass.create_task(datapoint.set_value(int_value))
+                self.send_datapoint_value(datapoint, int_value)
         elif self._mapping.hvac_switch_dp_id != 0 and self._mapping.hvac_switch_mode:
             bool_value = hvac_mode == self._mapping.hvac_switch_mode
             datapoint = self._device.datapoints.get_or_create(
@@ -305,7 +314,7 @@ class TuyaBLEClimate(TuyaBLEEntity, ClimateEntity):
                 bool_value,
             )
             if datapoint:
-                self._hass.create_task(datapoint.set_value(bool_value))
+                self.send_datapoint_value(datapoint, bool_value)
 
     async def async_set_preset_mode(self, preset_mode: str) -> None:
         """Set new preset mode."""
@@ -328,19 +337,18 @@ class TuyaBLEClimate(TuyaBLEEntity, ClimateEntity):
                     )
                     break
             else:
-                if self._mapping.preset_mode_dp_ids:
-                    for (
-                        dp_preset_mode,
+                # Every preset has own DP, switch all of them at once
+                for (
+                    dp_preset_mode,
+                    dp_id,
+                ) in self._mapping.preset_mode_dp_ids.items():
+                    self._coordinator.async_send_datapoint(
                         dp_id,
-                    ) in self._mapping.preset_mode_dp_ids.items():
-                        bool_value = dp_preset_mode == preset_mode
-                        datapoint = self._device.datapoints.get_or_create(
-                            dp_id,
-                            TuyaBLEDataPointType.DT_BOOL,
-                            bool_value,
-                        )
+                        TuyaBLEDataPointType.DT_BOOL,
+                        dp_preset_mode == preset_mode,
+                    )
             if datapoint:
-                self._hass.create_task(datapoint.set_value(bool_value))
+                self.send_datapoint_value(datapoint, bool_value)
 
 
 async def async_setup_entry(
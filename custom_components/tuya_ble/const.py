@@ -12,6 +12,12 @@ DEVICE_METADATA_UUIDS: Final = "uuids"
 
 DEVICE_DEF_MANUFACTURER: Final = "Tuya"
 SET_DISCONNECTED_DELAY = 10 * 60
+# Datapoint values set within this delay are sent in one frame,
+# 0 groups values set in the same event loop iteration
+DATAPOINTS_SEND_DELAY = 0
+# Datapoints reported within this delay update entities once, status is
+# reported in several frames a few milliseconds apart
+DATAPOINTS_CALLBACK_DELAY = 0.05
 
 CONF_UUID: Final = "uuid"
 CONF_LOCAL_KEY: Final = "local_key"
@@ -61,6 +67,8 @@ FINGERBOT_MODE_PROGRAM: Final = "program"
 FINGERBOT_BUTTON_EVENT: Final = "fingerbot_button_pressed"
 
 CONNECTED_DP_ID = -2
+CONNECTION_BREAKER_DP_ID = -3
+RESPONSE_TIME_DP_ID = -4
 
 
 class DPType(StrEnum):
@@ -1,6 +1,7 @@
 """The Tuya BLE integration."""
 
 from __future__ import annotations
+from collections.abc import Iterable
 from dataclasses import dataclass
 from typing import Any
 
@@ -35,6 +36,7 @@ from .tuya_ble import (
 
 from .cloud import HASSTuyaBLEDeviceManager
 from .const import (
+    DATAPOINTS_SEND_DELAY,
     DEVICE_DEF_MANUFACTURER,
     DOMAIN,
     DPType,
@@ -84,6 +86,9 @@ class TuyaBLEEntity(CoordinatorEntity):
         self._coordinator = coordinator
         self._device = device
         self._product = product
+        # Datapoints the entity state depends on, None for all of them
+        self._dp_ids: set[int] | None = None
+        self._written_state: tuple[Any, ...] | None = None
         if description.translation_key is None:
             self._attr_translation_key = description.key
         self.entity_description = description
@@ -104,10 +109,57 @@ class TuyaBLEEntity(CoordinatorEntity):
         """Return the associated BLE Device."""
         return self._device
 
+    def _set_datapoint_ids(self, *dp_ids: int) -> None:
+        """Update the entity only when one of the datapoints changes.
+
+        Availability of fingerbot entities depends on its mode and program,
+        so these datapoints are always included for fingerbots.
+        """
+        self._dp_ids = set(dp_ids)
+        if fingerbot := self._product.fingerbot:
+            self._dp_ids.update((fingerbot.mode, fingerbot.program))
+        self._dp_ids.discard(0)
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to updates of the datapoints."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._coordinator.async_add_datapoint_listener(
+                self._handle_coordinator_update, self._dp_ids
+            )
+        )
+
+    def _state_snapshot(self) -> tuple[Any, ...]:
+        return (
+            self.available,
+            self.state,
+            self.state_attributes,
+            self.extra_state_attributes,
+            self.icon,
+        )
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state to the state machine."""
+        self._written_state = self._state_snapshot()
+        super().async_write_ha_state()
+
+    @callback
+    def _async_write_ha_state_if_changed(self) -> None:
+        """Write the state only when it or its attributes changed.
+
+        Devices report unchanged datapoints again, e.g. periodic sensor
+        readings, which would be written as the same state every time.
+        """
+        snapshot = self._state_snapshot()
+        if snapshot != self._written_state:
+            self._written_state = snapshot
+            super().async_write_ha_state()
+
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self.async_write_ha_state()
+        self._async_write_ha_state_if_changed()
 
     def send_dp_value(
         self,
@@ -117,13 +169,16 @@ class TuyaBLEEntity(CoordinatorEntity):
     ) -> None:
 
         dpid = self.find_dpid(key)
-        if dpid is not None:
-            datapoint = self._device.datapoints.get_or_create(
-                dpid,
-                type,
-                value,
-            )
-            self._hass.create_task(datapoint.set_value(value))
+        if dpid is not None and value is not None:
+            self._coordinator.async_send_datapoint(dpid, type, value)
+
+    def send_datapoint_value(
+        self,
+        datapoint: TuyaBLEDataPoint,
+        value: bytes | bool | int | str,
+    ) -> None:
+        """Send new value of the datapoint to the device."""
+        self._coordinator.async_send_datapoint(datapoint.id, datapoint.type, value)
 
     def _send_command(self, commands: list[dict[str, Any]]) -> None:
         """Send the commands to the device"""
@@ -139,13 +194,9 @@ class TuyaBLEEntity(CoordinatorEntity):
                         self.send_dp_value(code, TuyaBLEDataPointType.DT_STRING, value)
                     elif dttype == DPType.ENUM:
                         int_value = 0
-                        values = self.device.function[code].values
-                        if isinstance(self.device.function[code].values, dict):
-                            range = self.device.function[code].values.get("range")
-                            if isinstance(range, list):
-                                int_value = (
-                                    range.index(value) if value in range else None
-                                )
+                        schema = self.device.schema.function.get(code)
+                        if schema is not None and schema.enum is not None:
+                            int_value = schema.enum_index.get(value)
                         self.send_dp_value(
                             code, TuyaBLEDataPointType.DT_ENUM, int_value
                         )
@@ -159,16 +210,8 @@ class TuyaBLEEntity(CoordinatorEntity):
         self, dpcode: DPCode | None, prefer_function: bool = False
     ) -> int | None:
         """Returns the dp id for the given code"""
-        if dpcode is None:
-            return None
-
-        order = ["status_range", "function"]
-        if prefer_function:
-            order = ["function", "status_range"]
-        for key in order:
-            if dpcode in getattr(self.device, key):
-                return getattr(self.device, key)[dpcode].dp_id
-
+        if (schema := self.device.schema.get(dpcode, prefer_function)) is not None:
+            return schema.dp_id
         return None
 
     def find_dpcode(
@@ -187,42 +230,20 @@ class TuyaBLEEntity(CoordinatorEntity):
         elif not isinstance(dpcodes, tuple):
             dpcodes = (dpcodes,)
 
-        order = ["status_range", "function"]
-        if prefer_function:
-            order = ["function", "status_range"]
-
-        # When we are not looking for a specific datatype, we can append status for
-        # searching
-        if not dptype:
-            order.append("status")
-
+        order = self.device.schema.lookup_order(prefer_function)
         for dpcode in dpcodes:
-            for key in order:
-                if dpcode not in getattr(self.device, key):
+            for schemas in order:
+                if (schema := schemas.get(dpcode)) is None:
                     continue
-                if (
-                    dptype == DPType.ENUM
-                    and getattr(self.device, key)[dpcode].type == DPType.ENUM
-                ):
-                    if not (
-                        enum_type := EnumTypeData.from_json(
-                            dpcode, getattr(self.device, key)[dpcode].values
-                        )
-                    ):
+                if dptype == DPType.ENUM and schema.type == DPType.ENUM:
+                    if schema.enum is None:
                         continue
-                    return enum_type
-
-                if (
-                    dptype == DPType.INTEGER
-                    and getattr(self.device, key)[dpcode].type == DPType.INTEGER
-                ):
-                    if not (
-                        integer_type := IntegerTypeData.from_json(
-                            dpcode, getattr(self.device, key)[dpcode].values
-                        )
-                    ):
+                    return schema.enum
+
+                if dptype == DPType.INTEGER and schema.type == DPType.INTEGER:
+                    if schema.integer is None:
                         continue
-                    return integer_type
+                    return schema.integer
 
                 if dptype not in (DPType.ENUM, DPType.INTEGER):
                     return dpcode
@@ -233,23 +254,20 @@ class TuyaBLEEntity(CoordinatorEntity):
         self, dpcode: DPCode | None, prefer_function: bool = False
     ) -> DPType | None:
         """Find a matching DPCode data type available on for this device."""
-        if dpcode is None:
-            return None
-
-        order = ["status_range", "function"]
-        if prefer_function:
-            order = ["function", "status_range"]
-        for key in order:
-            if dpcode in getattr(self.device, key):
-                return DPType(getattr(self.device, key)[dpcode].type)
-
+        if (schema := self.device.schema.get(dpcode, prefer_function)) is not None:
+            return schema.type
         return None
 
 
 class TuyaBLECoordinator(DataUpdateCoordinator[None]):
     """Data coordinator for receiving Tuya BLE updates."""
 
-    def __init__(self, hass: HomeAssistant, device: TuyaBLEDevice) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        device: TuyaBLEDevice,
+        send_delay: float = DATAPOINTS_SEND_DELAY,
+    ) -> None:
         """Initialise the coordinator."""
         super().__init__(
             hass,
@@ -259,6 +277,13 @@ class TuyaBLECoordinator(DataUpdateCoordinator[None]):
         self._device = device
         self._disconnected: bool = True
         self._unsub_disconnect: CALLBACK_TYPE | None = None
+        self._send_delay = send_delay
+        self._unsub_send: CALLBACK_TYPE | None = None
+        self._pending_datapoints: dict[
+            int, tuple[TuyaBLEDataPointType, bytes | bool | int | str]
+        ] = {}
+        # Entity callbacks by dp id, None key for ones listening to all
+        self._datapoint_listeners: dict[int | None, list[CALLBACK_TYPE]] = {}
         device.register_connected_callback(self._async_handle_connect)
         device.register_callback(self._async_handle_update)
         device.register_disconnected_callback(self._async_handle_disconnect)
@@ -275,11 +300,46 @@ class TuyaBLECoordinator(DataUpdateCoordinator[None]):
             self._disconnected = False
             self.async_update_listeners()
 
+    @callback
+    def async_add_datapoint_listener(
+        self, update_callback: CALLBACK_TYPE, dp_ids: Iterable[int] | None
+    ) -> CALLBACK_TYPE:
+        """Listen for updates of the datapoints, of all of them if None.
+
+        Connection changes are still reported to all coordinator listeners.
+        """
+        keys: list[int | None] = [None] if dp_ids is None else list(set(dp_ids))
+        for key in keys:
+            self._datapoint_listeners.setdefault(key, []).append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            for key in keys:
+                listeners = self._datapoint_listeners[key]
+                listeners.remove(update_callback)
+                if not listeners:
+                    del self._datapoint_listeners[key]
+
+        return remove_listener
+
+    @callback
+    def _async_update_datapoint_listeners(
+        self, updates: list[TuyaBLEDataPoint]
+    ) -> None:
+        """Call every listener of the updated datapoints once."""
+        listeners = dict.fromkeys(self._datapoint_listeners.get(None, ()))
+        for update in updates:
+            listeners.update(
+                dict.fromkeys(self._datapoint_listeners.get(update.id, ()))
+            )
+        for update_callback in listeners:
+            update_callback()
+
     @callback
     def _async_handle_update(self, updates: list[TuyaBLEDataPoint]) -> None:
-        """Just trigger the callbacks."""
+        """Trigger the callbacks of entities using the updated datapoints."""
         self._async_handle_connect()
-        self.async_set_updated_data(None)
+        self._async_update_datapoint_listeners(updates)
         info = get_device_product_info(self._device)
         if info and info.fingerbot and info.fingerbot.manual_control != 0:
             for update in updates:
@@ -292,6 +352,38 @@ class TuyaBLECoordinator(DataUpdateCoordinator[None]):
                         },
                     )
 
+    @callback
+    def async_send_datapoint(
+        self,
+        dp_id: int,
+        type: TuyaBLEDataPointType,
+        value: bytes | bool | int | str,
+    ) -> None:
+        """Queue new datapoint value.
+
+        Values queued in the same event loop iteration, or within send delay,
+        are sent to the device in a single frame.
+        """
+        self._pending_datapoints[dp_id] = (type, value)
+        if self._unsub_send is None:
+            if self._send_delay > 0:
+                self._unsub_send = async_call_later(
+                    self.hass, self._send_delay, self._async_send_datapoints
+                )
+            else:
+                self._unsub_send = self.hass.loop.call_soon(
+                    self._async_send_datapoints
+                ).cancel
+
+    @callback
+    def _async_send_datapoints(self, _: Any = None) -> None:
+        """Send queued datapoint values."""
+        self._unsub_send = None
+        datapoints = self._pending_datapoints
+        self._pending_datapoints = {}
+        if datapoints:
+            self.hass.async_create_task(self._device.set_datapoints(datapoints))
+
     @callback
     def _set_disconnected(self, _: None) -> None:
         """Invoke the idle timeout callback, called when the alarm fires."""
@@ -7,7 +7,7 @@ import logging
 import json
 import copy
 
-from typing import Any, cast
+from typing import Any
 
 from homeassistant.util import color as color_util
 
@@ -584,10 +584,7 @@ class TuyaBLELight(TuyaBLEEntity, LightEntity):
         ) and (self.get_dptype(dpcode) == DPType.JSON or self.get_dptype(dpcode) == DPType.STRING):
             self._color_data_dpcode = dpcode
             self._attr_supported_color_modes.add(ColorMode.HS)
-            if dpcode in self.device.function:
-                values = cast(str, self.device.function[dpcode].values)
-            else:
-                values = self.device.status_range[dpcode].values
+            values = self.device.schema.get(dpcode, prefer_function=True).values
 
             function_data = values
             if isinstance(function_data, str):
@@ -611,10 +608,27 @@ class TuyaBLELight(TuyaBLEEntity, LightEntity):
         if not self._attr_supported_color_modes:
             self._attr_supported_color_modes = {ColorMode.ONOFF}
 
+        dpcodes = (
+            description.key,
+            self._color_mode_dpcode,
+            self._brightness and self._brightness.dpcode,
+            self._brightness_max and self._brightness_max.dpcode,
+            self._brightness_min and self._brightness_min.dpcode,
+            self._color_temp and self._color_temp.dpcode,
+            self._color_data_dpcode,
+        )
+        dp_ids = [
+            dp_id
+            for dpcode in dpcodes
+            if (dp_id := self.find_dpid(dpcode, prefer_function=True)) is not None
+        ]
+        if dp_ids:
+            self._set_datapoint_ids(*dp_ids)
+
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self.async_write_ha_state()
+        self._async_write_ha_state_if_changed()
 
     @property
     def is_on(self) -> bool:
@@ -54,6 +54,8 @@ class TuyaBLENumberMapping:
     dp_type: TuyaBLEDataPointType | None = None
     coefficient: float = 1.0
     is_available: TuyaBLENumberIsAvailable = None
+    # Other datapoints read by is_available or getter
+    depends_on: tuple[int, ...] = ()
     getter: TuyaBLENumberGetter = None
     setter: TuyaBLENumberSetter = None
     mode: NumberMode = NumberMode.BOX
@@ -139,7 +141,7 @@ def set_fingerbot_program_repeat_count(
                 int.to_bytes(int(value), 2, "big") +
                 datapoint.value[2:]
             )
-            self._hass.create_task(datapoint.set_value(new_value))
+            self.send_datapoint_value(datapoint, new_value)
 
 
 def get_fingerbot_program_position(
@@ -165,7 +167,7 @@ def set_fingerbot_program_position(
         if datapoint and type(datapoint.value) is bytes:
             new_value = bytearray(datapoint.value)
             new_value[2] = int(value)
-            self._hass.create_task(datapoint.set_value(new_value))
+            self.send_datapoint_value(datapoint, new_value)
 
 
 @dataclass
@@ -668,6 +670,7 @@ class TuyaBLENumber(TuyaBLEEntity, NumberEntity):
         super().__init__(hass, coordinator, device, product, mapping.description)
         self._mapping = mapping
         self._attr_mode = mapping.mode
+        self._set_datapoint_ids(mapping.dp_id, *mapping.depends_on)
 
     @property
     def native_value(self) -> float | None:
@@ -720,9 +723,9 @@ class TuyaBLENumber(TuyaBLEEntity, NumberEntity):
                 length = len(datapoint.value) if datapoint.value else 2
                 length = max(1, min(length, 4))
                 new_value = int(int_value).to_bytes(length, "big")
-                self._hass.create_task(datapoint.set_value(new_value))
+                self.send_datapoint_value(datapoint, new_value)
             else:
-                self._hass.create_task(datapoint.set_value(int_value))
+                self.send_datapoint_value(datapoint, int_value)
 
     @property
     def available(self) -> bool:
@@ -306,6 +306,7 @@ class TuyaBLESelect(TuyaBLEEntity, SelectEntity):
         )
         self._mapping = mapping
         self._attr_options = mapping.description.options
+        self._set_datapoint_ids(mapping.dp_id)
 
     @property
     def current_option(self) -> str | None:
@@ -331,7 +332,7 @@ class TuyaBLESelect(TuyaBLEEntity, SelectEntity):
                 int_value,
             )
             if datapoint:
-                self._hass.create_task(datapoint.set_value(int_value))
+                self.send_datapoint_value(datapoint, int_value)
 
 
 async def async_setup_entry(
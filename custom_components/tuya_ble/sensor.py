@@ -31,10 +31,13 @@ from .const import (
     BATTERY_NOT_CHARGING,
     CO2_LEVEL_ALARM,
     CO2_LEVEL_NORMAL,
+    CONNECTION_BREAKER_DP_ID,
     DOMAIN,
+    RESPONSE_TIME_DP_ID,
 )
 from .devices import TuyaBLEData, TuyaBLEEntity, TuyaBLEProductInfo
 from .tuya_ble import TuyaBLEDataPointType, TuyaBLEDevice
+from .tuya_ble.connection import TuyaBLECircuitBreakerState
 _LOGGER = logging.getLogger(__name__)
 SIGNAL_STRENGTH_DP_ID = -1
 TuyaBLESensorIsAvailable = Callable[["TuyaBLESensor", TuyaBLEProductInfo], bool] | None
@@ -48,6 +51,8 @@ class TuyaBLESensorMapping:
     coefficient: float = 1.0
     icons: list[str] | None = None
     is_available: TuyaBLESensorIsAvailable = None
+    # Other datapoints read by is_available or getter
+    depends_on: tuple[int, ...] = ()
     default_value: str | int | float | None = None
 @dataclass
 class TuyaBLEBatteryMapping(TuyaBLESensorMapping):
@@ -119,6 +124,7 @@ mapping: dict[str, TuyaBLECategorySensorMapping] = {
                         ],
                     ),
                     is_available=is_co2_alarm_enabled,
+                    depends_on=(13,),
                 ),
                 TuyaBLESensorMapping(
                     dp_id=2,
@@ -525,6 +531,47 @@ rssi_mapping = TuyaBLESensorMapping(
     ),
     getter=rssi_getter,
 )
+def connection_breaker_getter(sensor: TuyaBLESensor) -> None:
+    breaker = sensor._device.breaker
+    sensor._attr_native_value = breaker.state.value
+    sensor._attr_extra_state_attributes = {
+        "failures": breaker.failures,
+        "rejected": breaker.rejected,
+        "retry_after": round(breaker.retry_after),
+    }
+connection_breaker_mapping = TuyaBLESensorMapping(
+    dp_id=CONNECTION_BREAKER_DP_ID,
+    description=SensorEntityDescription(
+        key="connection_breaker",
+        device_class=SensorDeviceClass.ENUM,
+        options=[state.value for state in TuyaBLECircuitBreakerState],
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    getter=connection_breaker_getter,
+)
+def response_time_getter(sensor: TuyaBLESensor) -> None:
+    rtt = sensor._device.rtt
+    sensor._attr_native_value = (
+        round(rtt.srtt * 1000) if rtt.srtt is not None else None
+    )
+    sensor._attr_extra_state_attributes = {
+        "variation": round(rtt.rttvar * 1000),
+        "timeout": round(rtt.timeout * 1000),
+        "timeouts": rtt.timeouts,
+    }
+response_time_mapping = TuyaBLESensorMapping(
+    dp_id=RESPONSE_TIME_DP_ID,
+    description=SensorEntityDescription(
+        key="response_time",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    getter=response_time_getter,
+)
 def get_mapping_by_device(device: TuyaBLEDevice) -> list[TuyaBLESensorMapping]:
     category = mapping.get(device.category)
     if category is not None and category.products is not None:
@@ -549,6 +596,9 @@ class TuyaBLESensor(TuyaBLEEntity, SensorEntity):
     ) -> None:
         super().__init__(hass, coordinator, device, product, mapping.description)
         self._mapping = mapping
+        if mapping.dp_id >= 0:
+            # Diagnostic sensors are updated with every datapoint
+            self._set_datapoint_ids(mapping.dp_id, *mapping.depends_on)
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
@@ -591,10 +641,22 @@ class TuyaBLESensor(TuyaBLEEntity, SensorEntity):
                     )
                     if index < len(self._mapping.icons):
                         self._attr_icon = self._mapping.icons[index]
-        self.async_write_ha_state()
+        self._async_write_ha_state_if_changed()
+    async def async_added_to_hass(self) -> None:
+        """Set up device update callbacks."""
+        await super().async_added_to_hass()
+        if self._mapping.dp_id == CONNECTION_BREAKER_DP_ID:
+            self.async_on_remove(
+                self._device.register_connection_status_callback(
+                    self._handle_coordinator_update
+                )
+            )
     @property
     def available(self) -> bool:
         """Return if entity is available."""
+        if self._mapping.dp_id == CONNECTION_BREAKER_DP_ID:
+            # Breaker state matters the most while device is disconnected
+            return True
         result = super().available
         if result and self._mapping.is_available:
             result = self._mapping.is_available(self, self._product)
@@ -614,7 +676,21 @@ async def async_setup_entry(
             data.device,
             data.product,
             rssi_mapping,
-        )
+        ),
+        TuyaBLESensor(
+            hass,
+            data.coordinator,
+            data.device,
+            data.product,
+            connection_breaker_mapping,
+        ),
+        TuyaBLESensor(
+            hass,
+            data.coordinator,
+            data.device,
+            data.product,
+            response_time_mapping,
+        ),
     ]
     for mapping in mappings:
         if mapping.force_add or data.device.datapoints.has_id(
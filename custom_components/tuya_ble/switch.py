@@ -46,6 +46,8 @@ class TuyaBLESwitchMapping:
     dp_type: TuyaBLEDataPointType | None = None
     bitmap_mask: bytes | None = None
     is_available: TuyaBLESwitchIsAvailable = None
+    # Other datapoints read by is_available or getter
+    depends_on: tuple[int, ...] = ()
     getter: TuyaBLESwitchGetter = None
     setter: TuyaBLESwitchSetter = None
 
@@ -105,7 +107,7 @@ def set_fingerbot_program_repeat_forever(
                 int.to_bytes(0xFFFF if value else 1, 2, "big") +
                 datapoint.value[2:]
             )
-            self._hass.create_task(datapoint.set_value(new_value))
+            self.send_datapoint_value(datapoint, new_value)
 
 
 @dataclass
@@ -355,6 +357,7 @@ mapping: dict[str, TuyaBLECategorySwitchMapping] = {
                         (dp := self._device.datapoints[101]) is not None
                         and (dp.value if not isinstance(dp.value, bytes) else int.from_bytes(dp.value[:1], "big")) == 1
                     ),
+                    depends_on=(101,),
                 ),
                 TuyaBLESwitchMapping(
                     dp_id=2,
@@ -367,6 +370,7 @@ mapping: dict[str, TuyaBLECategorySwitchMapping] = {
                         (dp := self._device.datapoints[102]) is not None
                         and (dp.value if not isinstance(dp.value, bytes) else int.from_bytes(dp.value[:1], "big")) == 1
                     ),
+                    depends_on=(102,),
                 ),
                 # Touch enable switches per channel
                 TuyaBLESwitchMapping(
@@ -542,6 +546,7 @@ class TuyaBLESwitch(TuyaBLEEntity, SwitchEntity):
     ) -> None:
         super().__init__(hass, coordinator, device, product, mapping.description)
         self._mapping = mapping
+        self._set_datapoint_ids(mapping.dp_id, *mapping.depends_on)
 
     @property
     def is_on(self) -> bool:
@@ -591,7 +596,7 @@ class TuyaBLESwitch(TuyaBLEEntity, SwitchEntity):
             )
             new_value = True
         if datapoint:
-            self._hass.create_task(datapoint.set_value(new_value))
+            self.send_datapoint_value(datapoint, new_value)
 
     def turn_off(self, **kwargs: Any) -> None:
         """Turn the switch off."""
@@ -618,7 +623,7 @@ class TuyaBLESwitch(TuyaBLEEntity, SwitchEntity):
             )
             new_value = False
         if datapoint:
-            self._hass.create_task(datapoint.set_value(new_value))
+            self.send_datapoint_value(datapoint, new_value)
 
     @property
     def available(self) -> bool:
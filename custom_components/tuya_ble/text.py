@@ -94,7 +94,7 @@ def set_fingerbot_program(
                 position = int(step_values[0])
                 delay = int(step_values[1]) if len(step_values) > 1 else 0
                 new_value += pack(">BH", position, delay)
-            self._hass.create_task(datapoint.set_value(new_value))
+            self.send_datapoint_value(datapoint, new_value)
 
 
 @dataclass
@@ -105,6 +105,8 @@ class TuyaBLETextMapping:
     dp_type: TuyaBLEDataPointType | None = None
     default_value: str | None = None
     is_available: TuyaBLETextIsAvailable = None
+    # Other datapoints read by is_available or getter
+    depends_on: tuple[int, ...] = ()
     getter: Callable[[TuyaBLEText], None] | None = None
     setter: Callable[[TuyaBLEText], None] | None = None
 
@@ -196,6 +198,7 @@ class TuyaBLEText(TuyaBLEEntity, TextEntity):
     ) -> None:
         super().__init__(hass, coordinator, device, product, mapping.description)
         self._mapping = mapping
+        self._set_datapoint_ids(mapping.dp_id, *mapping.depends_on)
 
     @property
     def available(self) -> bool:
@@ -228,7 +231,7 @@ class TuyaBLEText(TuyaBLEEntity, TextEntity):
             value,
         )
         if datapoint:
-            self._hass.create_task(datapoint.set_value(value))
+            self.send_datapoint_value(datapoint, value)
 
 
 async def async_setup_entry(
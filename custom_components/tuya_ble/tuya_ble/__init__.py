@@ -3,6 +3,7 @@ from __future__ import annotations
 __version__ = "0.1.0"
 
 
+from .connection import TuyaBLEConnectionScheduler, connection_scheduler
 from .const import (
     SERVICE_UUID,
     TuyaBLEDataPointType, 
@@ -16,9 +17,11 @@ from .tuya_ble import TuyaBLEDataPoint, TuyaBLEDevice, TuyaBLEEntityDescription
 
 __all__ = [
     "AbstaractTuyaBLEDeviceManager",
+    "TuyaBLEConnectionScheduler",
     "TuyaBLEDataPoint",
     "TuyaBLEDataPointType",
     "TuyaBLEDevice",
     "TuyaBLEDeviceCredentials",
     "SERVICE_UUID",
+    "connection_scheduler",
 ]
@@ -0,0 +1,107 @@
+"""Capture of raw Tuya BLE traffic.
+
+Capture file starts with CAPTURE_MAGIC followed by records, each one is
+a header packed as CAPTURE_RECORD_FORMAT (wall clock timestamp, record
+type and length of data) and the data itself: notification as received
+or packet as written. Connection events have no data, they tell the
+decoder to start a new session. The decoder is part of the benchmarks,
+python -m benchmarks.capture.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from enum import IntEnum
+from struct import calcsize, pack, unpack
+from typing import BinaryIO
+
+from .exceptions import TuyaBLEDataFormatError, TuyaBLEDataLengthError
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b"TBLECAP\x01"
+CAPTURE_RECORD_FORMAT = ">dBH"
+CAPTURE_RECORD_SIZE = calcsize(CAPTURE_RECORD_FORMAT)
+
+
+class TuyaBLECaptureRecordType(IntEnum):
+    RECEIVED = 0
+    SENT = 1
+    CONNECTED = 2
+    DISCONNECTED = 3
+
+
+@dataclass
+class TuyaBLECaptureRecord:
+    timestamp: float
+    type: TuyaBLECaptureRecordType
+    data: bytes
+
+
+class TuyaBLECaptureWriter:
+    """Appends records to a capture file.
+
+    The file is opened, written and closed by a background thread, records
+    are handed over through a queue, so capturing never blocks the event
+    loop. Records are timestamped when they are queued.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._queue: queue.SimpleQueue[bytes | None] = queue.SimpleQueue()
+        self._failed = False
+        self.records = 0
+        self._thread = threading.Thread(
+            target=self._run, name="TuyaBLECaptureWriter", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            with open(self._path, "ab") as file:
+                if file.tell() == 0:
+                    file.write(CAPTURE_MAGIC)
+                while (record := self._queue.get()) is not None:
+                    file.write(record)
+        except OSError:
+            self._failed = True
+            _LOGGER.error("Capture to %s failed", self._path, exc_info=True)
+
+    def write(
+        self, type: TuyaBLECaptureRecordType, data: bytes = b""
+    ) -> None:
+        if self._failed:
+            return
+        self._queue.put(
+            pack(CAPTURE_RECORD_FORMAT, time.time(), type, len(data)) + data
+        )
+        self.records += 1
+
+    def close(self) -> None:
+        """Stop capturing, queued records are still written until join."""
+        self._queue.put(None)
+
+    def join(self, timeout: float | None = None) -> None:
+        """Wait until the file is closed, not to be called from the loop."""
+        self._thread.join(timeout)
+
+
+def read_capture(file: BinaryIO) -> Iterator[TuyaBLECaptureRecord]:
+    """Read records of capture file one by one."""
+    magic = file.read(len(CAPTURE_MAGIC))
+    if magic != CAPTURE_MAGIC:
+        raise TuyaBLEDataFormatError()
+    while header := file.read(CAPTURE_RECORD_SIZE):
+        if len(header) < CAPTURE_RECORD_SIZE:
+            raise TuyaBLEDataLengthError()
+        timestamp, type, length = unpack(CAPTURE_RECORD_FORMAT, header)
+        data = file.read(length)
+        if len(data) < length:
+            raise TuyaBLEDataLengthError()
+        yield TuyaBLECaptureRecord(
+            timestamp, TuyaBLECaptureRecordType(type), data
+        )
@@ -0,0 +1,152 @@
+"""Low level encoding primitives of the Tuya BLE protocol."""
+from __future__ import annotations
+
+from Crypto.Cipher import AES
+
+from .exceptions import TuyaBLEDataFormatError
+
+CRC16_INIT = 0xFFFF
+CRC16_POLY = 0xA001  # CRC-16/MODBUS, reflected 0x8005
+
+
+def _build_crc16_table() -> tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ CRC16_POLY
+            else:
+                crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC16_TABLE = _build_crc16_table()
+
+
+def calc_crc16(data: bytes, crc: int = CRC16_INIT) -> int:
+    """Calculate CRC-16/MODBUS of data."""
+    table = CRC16_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def pack_int(value: int) -> bytearray:
+    """Encode unsigned integer as a variable length sequence of 7-bit groups."""
+    result = bytearray()
+    while True:
+        curr_byte = value & 0x7F
+        value >>= 7
+        if value != 0:
+            result.append(curr_byte | 0x80)
+        else:
+            result.append(curr_byte)
+            return result
+
+
+def unpack_int(data: bytes, start_pos: int) -> tuple[int, int]:
+    """Decode variable length integer, returns value and position after it."""
+    result: int = 0
+    offset: int = 0
+    data_len = len(data)
+    while offset < 5:
+        pos: int = start_pos + offset
+        if pos >= data_len:
+            raise TuyaBLEDataFormatError()
+        curr_byte: int = data[pos]
+        result |= (curr_byte & 0x7F) << (offset * 7)
+        offset += 1
+        if (curr_byte & 0x80) == 0:
+            break
+    if offset > 4:
+        raise TuyaBLEDataFormatError()
+    return (result, start_pos + offset)
+
+
+class TuyaBLECipher:
+    """AES-128-CBC cipher which computes the key schedule only once.
+
+    CBC objects are stateful, after every call the chaining value becomes
+    the last encrypted block. Instead of creating new cipher object for
+    every frame the chaining value is compensated: on encryption the first
+    block is additionally XOR-ed with the current chaining value, and on
+    decryption the IV is decrypted as a throwaway block in front of data.
+    """
+
+    def __init__(self, key: bytes) -> None:
+        self._encryptor = AES.new(key, AES.MODE_CBC, bytes(16))
+        self._encryptor_state = 0
+        self._decryptor = AES.new(key, AES.MODE_CBC, bytes(16))
+
+    def encrypt(self, iv: bytes, data: bytes) -> bytes:
+        """Encrypt data padded to the block size using given IV."""
+        first_block = (
+            int.from_bytes(data[:16], "big")
+            ^ int.from_bytes(iv, "big")
+            ^ self._encryptor_state
+        )
+        result = self._encryptor.encrypt(first_block.to_bytes(16, "big") + data[16:])
+        self._encryptor_state = int.from_bytes(result[-16:], "big")
+        return result
+
+    def decrypt(self, data: bytes) -> bytes:
+        """Decrypt data which is prefixed with 16 bytes of IV."""
+        return self._decryptor.decrypt(data)[16:]
+
+    def decrypt_in_place(self, data: memoryview) -> memoryview:
+        """Decrypt writable data prefixed with IV, returns view of plaintext."""
+        self._decryptor.decrypt(data, output=data)
+        return data[16:]
+
+
+class TuyaBLEInputBuffer:
+    """Reassembles incoming frame from notification fragments.
+
+    Storage is preallocated for the length announced in the first fragment
+    and reused while next frames fit into it. Fragments are written into
+    the storage in place, and the complete frame is exposed as memoryview,
+    so it is decrypted and parsed without intermediate copies.
+    """
+
+    def __init__(self) -> None:
+        self._storage = bytearray()
+        self._view = memoryview(self._storage)
+        self.expected_packet_num = 0
+        self.expected_length = 0
+        self.length = 0
+
+    def start(self, expected_length: int) -> None:
+        """Start new frame of given length."""
+        if expected_length > len(self._storage):
+            self._storage = bytearray(expected_length)
+            self._view = memoryview(self._storage)
+        self.expected_length = expected_length
+        self.length = 0
+
+    def append(self, data: bytes, start_pos: int) -> bool:
+        """Copy fragment data starting at start_pos, False if frame overflows."""
+        length = self.length
+        end = length + len(data) - start_pos
+        if end <= self.expected_length:
+            # Same size slice assignment never resizes the storage, for
+            # fragments of MTU size it is faster than memoryview copy
+            self._storage[length:end] = data[start_pos:]
+        self.length = end
+        self.expected_packet_num += 1
+        return end <= self.expected_length
+
+    @property
+    def complete(self) -> bool:
+        return self.length == self.expected_length
+
+    @property
+    def frame(self) -> memoryview:
+        """Writable view of received frame, valid until next start."""
+        return self._view[:self.length]
+
+    def clear(self) -> None:
+        self.expected_packet_num = 0
+        self.expected_length = 0
+        self.length = 0
@@ -0,0 +1,248 @@
+"""Scheduling of connection attempts to Tuya BLE devices."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import Enum
+
+from bleak.backends.device import BLEDevice
+from bleak_retry_connector import BleakClientWithServiceCache
+
+from .const import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+    BREAKER_RESET_TIMEOUT_MAX,
+    CONNECT_ATTEMPTS,
+    CONNECT_BACKOFF_BASE,
+    CONNECT_BACKOFF_MAX,
+    CONNECT_SLOTS_PER_ADAPTER,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_ADAPTER = "default"
+
+# Signature of bleak_retry_connector.establish_connection, which is the
+# default connector; the simulator provides its own
+TuyaBLEConnector = Callable[..., Awaitable[BleakClientWithServiceCache]]
+
+
+def get_adapter(ble_device: BLEDevice) -> str:
+    """Return name of the adapter or proxy the device is reachable through."""
+    details = ble_device.details
+    if isinstance(details, dict):
+        # Home Assistant bluetooth stack: adapter address or proxy name
+        if source := details.get("source"):
+            return str(source)
+        # BlueZ object path: /org/bluez/hci0/dev_XX_XX_XX_XX_XX_XX
+        if path := details.get("path"):
+            parts = str(path).split("/")
+            if len(parts) > 3:
+                return parts[3]
+    return DEFAULT_ADAPTER
+
+
+@dataclass
+class TuyaBLEConnectionSlotStats:
+    """Statistics of connection slots of an adapter."""
+
+    max_connections: int
+    active: int = 0
+    waiting: int = 0
+    connects: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    last_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.connects if self.connects else 0.0
+
+
+class TuyaBLEConnectionScheduler:
+    """Limits number of simultaneous connection attempts per adapter.
+
+    Devices waiting for a slot of the same adapter are served in the order
+    they asked for it. Every attempt takes a new place at the end of the
+    queue, so a device which is retrying does not block other devices.
+    """
+
+    def __init__(self, max_connections: int = CONNECT_SLOTS_PER_ADAPTER) -> None:
+        self._max_connections = max_connections
+        self._limits: dict[str, int] = {}
+        self._slots: dict[str, asyncio.Semaphore] = {}
+        self._stats: dict[str, TuyaBLEConnectionSlotStats] = {}
+
+    def set_max_connections(self, adapter: str, max_connections: int) -> None:
+        """Set number of simultaneous connection attempts for the adapter.
+
+        Takes effect as soon as no attempt through the adapter is running
+        or waiting for a slot.
+        """
+        self._limits[adapter] = max_connections
+        self._apply_limit(adapter)
+
+    def _apply_limit(self, adapter: str) -> None:
+        stats = self._stats.get(adapter)
+        if stats is None or stats.active or stats.waiting:
+            return
+        max_connections = self._limits.get(adapter, self._max_connections)
+        if stats.max_connections != max_connections:
+            stats.max_connections = max_connections
+            self._slots[adapter] = asyncio.Semaphore(max_connections)
+
+    def _get_stats(self, adapter: str) -> TuyaBLEConnectionSlotStats:
+        stats = self._stats.get(adapter)
+        if stats is None:
+            max_connections = self._limits.get(adapter, self._max_connections)
+            stats = TuyaBLEConnectionSlotStats(max_connections)
+            self._stats[adapter] = stats
+            self._slots[adapter] = asyncio.Semaphore(max_connections)
+        return stats
+
+    def stats(self, adapter: str) -> TuyaBLEConnectionSlotStats:
+        """Return statistics of the adapter."""
+        return self._get_stats(adapter)
+
+    @property
+    def adapters(self) -> list[str]:
+        return list(self._stats)
+
+    @asynccontextmanager
+    async def slot(self, adapter: str) -> AsyncIterator[float]:
+        """Wait for a free connection slot, yields time spent in the queue."""
+        stats = self._get_stats(adapter)
+        slot = self._slots[adapter]
+        start = time.monotonic()
+        stats.waiting += 1
+        try:
+            await slot.acquire()
+        finally:
+            stats.waiting -= 1
+        wait = time.monotonic() - start
+        stats.active += 1
+        stats.connects += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.last_wait = wait
+        if wait > 1:
+            _LOGGER.debug(
+                "%s: Waited %.1fs for connection slot, %s more waiting",
+                adapter,
+                wait,
+                stats.waiting,
+            )
+        try:
+            yield wait
+        finally:
+            stats.active -= 1
+            slot.release()
+            self._apply_limit(adapter)
+
+
+connection_scheduler = TuyaBLEConnectionScheduler()
+
+
+@dataclass
+class TuyaBLEReconnectPolicy:
+    """Retry budget and delays between connection attempts."""
+
+    attempts: int = CONNECT_ATTEMPTS
+    backoff_base: float = CONNECT_BACKOFF_BASE
+    backoff_max: float = CONNECT_BACKOFF_MAX
+
+    def get_delay(self, retry: int) -> float:
+        """Return delay before given retry, starting from 0.
+
+        Delay is doubled with every retry up to the maximum, and the upper
+        half of it is randomized, so devices which lost connection at the
+        same time do not retry all at once.
+        """
+        delay = min(self.backoff_max, self.backoff_base * (2 ** min(retry, 16)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+class TuyaBLECircuitBreakerState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class TuyaBLECircuitBreaker:
+    """Stops connecting to a device which is not reachable.
+
+    After a number of failed connections in a row the breaker opens and
+    connection attempts are rejected without using the adapter. When reset
+    timeout expires the breaker becomes half-open and lets one attempt
+    through: on success it closes, on failure it opens again with the
+    timeout doubled.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+        reset_timeout_max: float = BREAKER_RESET_TIMEOUT_MAX,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._reset_timeout_max = reset_timeout_max
+        self._current_reset_timeout = reset_timeout
+        self._opened_at: float | None = None
+        self._failures = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> TuyaBLECircuitBreakerState:
+        if self._opened_at is None:
+            return TuyaBLECircuitBreakerState.CLOSED
+        if self.retry_after > 0:
+            return TuyaBLECircuitBreakerState.OPEN
+        return TuyaBLECircuitBreakerState.HALF_OPEN
+
+    @property
+    def failures(self) -> int:
+        """Count of failed connections in a row."""
+        return self._failures
+
+    @property
+    def rejected(self) -> int:
+        """Count of connection attempts rejected while the breaker was open."""
+        return self._rejected
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets next attempt through."""
+        if self._opened_at is None:
+            return 0.0
+        return max(
+            0.0, self._opened_at + self._current_reset_timeout - time.monotonic()
+        )
+
+    def allow(self) -> bool:
+        """Check whether connection attempt may be made now."""
+        if self.state == TuyaBLECircuitBreakerState.OPEN:
+            self._rejected += 1
+            return False
+        return True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._current_reset_timeout = self._reset_timeout
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._opened_at is not None:
+            # Probe of half-open breaker failed
+            self._current_reset_timeout = min(
+                self._reset_timeout_max, self._current_reset_timeout * 2
+            )
+            self._opened_at = time.monotonic()
+        elif self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
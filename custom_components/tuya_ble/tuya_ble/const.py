@@ -4,8 +4,25 @@ from enum import Enum
 
 GATT_MTU = 20
 
+# Security flag, IV and encrypted frame with up to 64K of data
+MAX_INPUT_LENGTH = 1 + 16 + ((12 + 0xFFFF + 2 + 15) // 16) * 16
+
 DEFAULT_ATTEMPTS = 0xFFFF
 
+# Simultaneous connection attempts through one adapter or proxy
+CONNECT_SLOTS_PER_ADAPTER = 2
+
+# Connection attempts before giving up, delays between them grow exponentially
+CONNECT_ATTEMPTS = 5
+CONNECT_BACKOFF_BASE = 1.0
+CONNECT_BACKOFF_MAX = 30.0
+
+# Failed connections in a row which open the circuit breaker, and time in
+# seconds before the next probe; doubled every time the probe fails
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT = 60.0
+BREAKER_RESET_TIMEOUT_MAX = 900.0
+
 CHARACTERISTIC_NOTIFY = "00002b10-0000-1000-8000-00805f9b34fb"
 CHARACTERISTIC_WRITE = "00002b11-0000-1000-8000-00805f9b34fb"
 
@@ -13,7 +30,13 @@ SERVICE_UUID = "0000a201-0000-1000-8000-00805f9b34fb"
 
 MANUFACTURER_DATA_ID = 0x07D0
 
-RESPONSE_WAIT_TIMEOUT = 60
+# Timeout of response is derived from measured round-trip time, in seconds
+RESPONSE_TIMEOUT_INITIAL = 5.0
+RESPONSE_TIMEOUT_MIN = 1.0
+RESPONSE_TIMEOUT_MAX = 15.0
+
+# Requests which may wait for response at the same time
+SEND_WINDOW = 2
 
 
 class TuyaBLECode(Enum):
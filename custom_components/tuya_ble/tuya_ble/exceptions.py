@@ -38,3 +38,10 @@ class TuyaBLEDeviceError(TuyaBLEError):
 
     def __init__(self, code: int) -> None:
         super().__init__(("BLE deice returned error code %s") % (code))
+
+
+class TuyaBLEDisconnectedError(TuyaBLEError):
+    """Raised when connection was lost while waiting for response."""
+
+    def __init__(self) -> None:
+        super().__init__("Connection to BLE device was lost")
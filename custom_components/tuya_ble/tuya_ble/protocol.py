@@ -0,0 +1,587 @@
+"""Transport independent implementation of the Tuya BLE protocol."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import secrets
+import time
+from dataclasses import dataclass
+from struct import calcsize, pack, unpack_from
+
+from .codec import (
+    TuyaBLECipher,
+    TuyaBLEInputBuffer,
+    calc_crc16,
+    pack_int,
+    unpack_int,
+)
+from .const import (
+    GATT_MTU,
+    MAX_INPUT_LENGTH,
+    TuyaBLECode,
+    TuyaBLEDataPointType,
+)
+from .exceptions import (
+    TuyaBLEDataCRCError,
+    TuyaBLEDataFormatError,
+    TuyaBLEDataLengthError,
+    TuyaBLEDeviceError,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class TuyaBLEResponseEvent:
+    """Device responded to the request with given sequence number."""
+
+    response_to: int
+    result: int
+
+
+@dataclass
+class TuyaBLEDatapointsEvent:
+    """Device reported values of datapoints."""
+
+    timestamp: float
+    flags: int
+    datapoints: list[tuple[int, TuyaBLEDataPointType, bytes | bool | int | str]]
+
+
+@dataclass
+class TuyaBLEReplyEvent:
+    """Device expects the reply to be sent back."""
+
+    code: TuyaBLECode
+    data: bytes
+    response_to: int
+
+
+TuyaBLEEvent = TuyaBLEResponseEvent | TuyaBLEDatapointsEvent | TuyaBLEReplyEvent
+
+
+def encode_datapoint_value(
+    type: TuyaBLEDataPointType, value: bytes | bool | int | str
+) -> bytes:
+    """Encode value of datapoint as it is sent over the air."""
+    match type:
+        case TuyaBLEDataPointType.DT_RAW | TuyaBLEDataPointType.DT_BITMAP:
+            return value
+        case TuyaBLEDataPointType.DT_BOOL:
+            return pack(">B", 1 if value else 0)
+        case TuyaBLEDataPointType.DT_VALUE:
+            return pack(">i", value)
+        case TuyaBLEDataPointType.DT_ENUM:
+            if value > 0xFFFF:
+                return pack(">I", value)
+            elif value > 0xFF:
+                return pack(">H", value)
+            else:
+                return pack(">B", value)
+        case TuyaBLEDataPointType.DT_STRING:
+            return value.encode()
+
+
+class TuyaBLEProtocol:
+    """Protocol state machine of one device, without any I/O.
+
+    Notifications are passed to receive_data, which returns events decoded
+    from every complete frame. Frames to be written to the device are built
+    by build_packets. Keys, sequence numbers and the state negotiated with
+    the device are kept here, so the same core is used by BLE connection,
+    simulator and replay of captured traffic.
+    """
+
+    def __init__(self, name: str = "", gatt_mtu: int = GATT_MTU) -> None:
+        self.name = name
+        self.gatt_mtu = gatt_mtu
+
+        self.is_bound = False
+        self.is_paired = False
+        self.flags = 0
+        self.protocol_version = 2
+
+        self.device_version: str = ""
+        self.protocol_version_str: str = ""
+        self.hardware_version: str = ""
+
+        self.auth_key: bytes | None = None
+        self.local_key: bytes | None = None
+        self.login_key: bytes | None = None
+        self.session_key: bytes | None = None
+        self._ciphers: dict[int, TuyaBLECipher] = {}
+
+        self._current_seq_num = 1
+        self._current_dp_seq_num = 1
+        self._input_buffer = TuyaBLEInputBuffer()
+
+    def set_local_key(self, local_key: bytes) -> None:
+        self.local_key = local_key
+        self.login_key = hashlib.md5(local_key).digest()
+        self._ciphers.clear()
+
+    def reset(self) -> None:
+        """Forget the session, called when connection is lost."""
+        self.is_paired = False
+        self._ciphers.clear()
+        self._input_buffer.clear()
+
+    def reset_seq_num(self) -> None:
+        self._current_seq_num = 1
+
+    def next_seq_num(self) -> int:
+        result = self._current_seq_num
+        self._current_seq_num += 1
+        return result
+
+    def next_dp_seq_num(self) -> int:
+        result = self._current_dp_seq_num
+        self._current_dp_seq_num = (self._current_dp_seq_num + 1) & 0xFFFFFFFF
+        return result
+
+    def _get_key(self, security_flag: int) -> bytes:
+        if security_flag == 1:
+            return self.auth_key
+        if security_flag == 4:
+            return self.login_key
+        elif security_flag == 5:
+            return self.session_key
+        else:
+            pass
+
+    def _get_cipher(self, security_flag: int) -> TuyaBLECipher:
+        cipher = self._ciphers.get(security_flag)
+        if cipher is None:
+            key = self._get_key(security_flag)
+            if key is None:
+                # Unknown security flag or session was not established
+                raise TuyaBLEDataFormatError()
+            cipher = TuyaBLECipher(key)
+            self._ciphers[security_flag] = cipher
+        return cipher
+
+    def build_pairing_request(self, uuid: str, device_id: str) -> bytes:
+        result = bytearray()
+
+        result += uuid.encode()
+        result += self.local_key
+        result += device_id.encode()
+        for _ in range(44 - len(result)):
+            result += b"\x00"
+
+        return result
+
+    def build_packets(
+        self,
+        seq_num: int,
+        code: TuyaBLECode,
+        data: bytes,
+        response_to: int = 0,
+    ) -> list[bytes]:
+        """Build frame and split it into packets of MTU size."""
+        iv = secrets.token_bytes(16)
+        security_flag: int
+        if code == TuyaBLECode.FUN_SENDER_DEVICE_INFO:
+            security_flag = 4
+        else:
+            security_flag = 5
+
+        raw = bytearray()
+        raw += pack(">IIHH", seq_num, response_to, code.value, len(data))
+        raw += data
+        crc = calc_crc16(raw)
+        raw += pack(">H", crc)
+        while len(raw) % 16 != 0:
+            raw += b"\x00"
+
+        cipher = self._get_cipher(security_flag)
+        encrypted = bytes((security_flag,)) + iv + cipher.encrypt(iv, raw)
+
+        command = []
+        packet_num = 0
+        pos = 0
+        length = len(encrypted)
+        while pos < length:
+            packet = bytearray()
+            packet += pack_int(packet_num)
+
+            if packet_num == 0:
+                packet += pack_int(length)
+                packet += pack(">B", self.protocol_version << 4)
+
+            data_part = encrypted[
+                pos:pos + self.gatt_mtu - len(packet)  # fmt: skip
+            ]
+            packet += data_part
+            command.append(packet)
+
+            pos += len(data_part)
+            packet_num += 1
+
+        return command
+
+    def build_datapoints(
+        self,
+        datapoints: list[tuple[int, TuyaBLEDataPointType, bytes]],
+    ) -> tuple[TuyaBLECode, bytes]:
+        """Encode datapoints with values, returns code and data of frame."""
+        data = bytearray()
+        if self.protocol_version == 3:
+            code = TuyaBLECode.FUN_SENDER_DPS
+            header_format = ">BBB"
+        elif self.protocol_version >= 4:
+            code = TuyaBLECode.FUN_SENDER_DPS_V4
+            header_format = ">BBH"
+            data += pack(">BIB", 0, self.next_dp_seq_num(), 0)
+        else:
+            raise TuyaBLEDeviceError(0)
+        for dp_id, type, value in datapoints:
+            data += pack(header_format, dp_id, int(type.value), len(value))
+            data += value
+        return (code, bytes(data))
+
+    def receive_data(self, data: bytes) -> list[TuyaBLEEvent]:
+        """Handle notification, returns events of the completed frame."""
+        _LOGGER.debug("%s: Packet received: %s", self.name, data.hex())
+
+        pos: int = 0
+        packet_num: int
+
+        packet_num, pos = unpack_int(data, pos)
+
+        if packet_num < self._input_buffer.expected_packet_num:
+            _LOGGER.error(
+                "%s: Unexpcted packet (number %s) in notifications, " "expected %s",
+                self.name,
+                packet_num,
+                self._input_buffer.expected_packet_num,
+            )
+            self._input_buffer.clear()
+
+        if packet_num == self._input_buffer.expected_packet_num:
+            if packet_num == 0:
+                expected_length, pos = unpack_int(data, pos)
+                if expected_length > MAX_INPUT_LENGTH:
+                    _LOGGER.error(
+                        "%s: Unexpcted length of data in notifications: %s",
+                        self.name,
+                        expected_length,
+                    )
+                    return []
+                # Protocol version follows the length
+                pos += 1
+                if pos > len(data):
+                    raise TuyaBLEDataLengthError()
+                self._input_buffer.start(expected_length)
+            appended = self._input_buffer.append(data, pos)
+        else:
+            _LOGGER.error(
+                "%s: Missing packet (number %s) in notifications, received %s",
+                self.name,
+                self._input_buffer.expected_packet_num,
+                packet_num,
+            )
+            self._input_buffer.clear()
+            return []
+
+        if not appended:
+            _LOGGER.error(
+                "%s: Unexpcted length of data in notifications, "
+                "received %s expected %s",
+                self.name,
+                self._input_buffer.length,
+                self._input_buffer.expected_length,
+            )
+            self._input_buffer.clear()
+            return []
+        elif self._input_buffer.complete:
+            return self._parse_input()
+        return []
+
+    def _parse_input(self) -> list[TuyaBLEEvent]:
+        frame = self._input_buffer.frame
+        self._input_buffer.clear()
+
+        # Security flag, IV and whole blocks of encrypted frame
+        if len(frame) < 33 or (len(frame) - 1) % 16 != 0:
+            raise TuyaBLEDataLengthError()
+        security_flag = frame[0]
+
+        cipher = self._get_cipher(security_flag)
+        raw = cipher.decrypt_in_place(frame[1:])
+
+        seq_num: int
+        response_to: int
+        _code: int
+        length: int
+        seq_num, response_to, _code, length = unpack_from(">IIHH", raw)
+
+        data_end_pos = length + 12
+        raw_length = len(raw)
+        if raw_length < data_end_pos:
+            raise TuyaBLEDataLengthError()
+        if raw_length > data_end_pos:
+            if raw_length < data_end_pos + 2:
+                raise TuyaBLEDataLengthError()
+            calc_crc = calc_crc16(raw[:data_end_pos])
+            (data_crc,) = unpack_from(">H", raw, data_end_pos)
+            if calc_crc != data_crc:
+                raise TuyaBLEDataCRCError()
+        data = bytes(raw[12:data_end_pos])
+
+        code: TuyaBLECode
+        try:
+            code = TuyaBLECode(_code)
+        except ValueError:
+            _LOGGER.debug(
+                "%s: Received unknown message: #%s %x, response to #%s, data %s",
+                self.name,
+                seq_num,
+                _code,
+                response_to,
+                data.hex(),
+            )
+            return []
+
+        if response_to != 0:
+            _LOGGER.debug(
+                "%s: Received: #%s %s, response to #%s",
+                self.name,
+                seq_num,
+                code.name,
+                response_to,
+            )
+        else:
+            _LOGGER.debug(
+                "%s: Received: #%s %s",
+                self.name,
+                seq_num,
+                code.name,
+            )
+
+        return self._handle_command_or_response(seq_num, response_to, code, data)
+
+    def _parse_timestamp(self, data: bytes, start_pos: int) -> tuple[float, int]:
+        timestamp: float
+        pos = start_pos
+        if pos >= len(data):
+            raise TuyaBLEDataLengthError()
+        time_type = data[pos]
+        pos += 1
+        end_pos = pos
+        match time_type:
+            case 0:
+                end_pos += 13
+                if end_pos > len(data):
+                    raise TuyaBLEDataLengthError()
+                try:
+                    timestamp = int(data[pos:end_pos].decode()) / 1000
+                except ValueError:
+                    # Not a number, including invalid UTF-8
+                    raise TuyaBLEDataFormatError() from None
+                pass
+            case 1:
+                end_pos += 4
+                if end_pos > len(data):
+                    raise TuyaBLEDataLengthError()
+                timestamp = int.from_bytes(data[pos:end_pos], "big") * 1.0
+                pass
+            case _:
+                raise TuyaBLEDataFormatError()
+
+        _LOGGER.debug(
+            "%s: Received timestamp: %s",
+            self.name,
+            time.ctime(timestamp),
+        )
+        return (timestamp, end_pos)
+
+    def _parse_datapoints(
+        self,
+        timestamp: float,
+        flags: int,
+        data: bytes,
+        start_pos: int,
+        header_format: str,
+        min_length: int,
+    ) -> TuyaBLEDatapointsEvent:
+        datapoints: list[
+            tuple[int, TuyaBLEDataPointType, bytes | bool | int | str]
+        ] = []
+        header_size = calcsize(header_format)
+
+        pos = start_pos
+        while len(data) - pos >= min_length:
+            id: int
+            _type: int
+            data_len: int
+            id, _type, data_len = unpack_from(header_format, data, pos)
+            if _type > TuyaBLEDataPointType.DT_BITMAP.value:
+                raise TuyaBLEDataFormatError()
+            type: TuyaBLEDataPointType = TuyaBLEDataPointType(_type)
+            pos += header_size
+            next_pos = pos + data_len
+            if next_pos > len(data):
+                raise TuyaBLEDataLengthError()
+            raw_value = data[pos:next_pos]
+            match type:
+                case (TuyaBLEDataPointType.DT_RAW | TuyaBLEDataPointType.DT_BITMAP):
+                    value = raw_value
+                case TuyaBLEDataPointType.DT_BOOL:
+                    value = int.from_bytes(raw_value, "big") != 0
+                case (TuyaBLEDataPointType.DT_VALUE | TuyaBLEDataPointType.DT_ENUM):
+                    value = int.from_bytes(raw_value, "big", signed=True)
+                case TuyaBLEDataPointType.DT_STRING:
+                    try:
+                        value = raw_value.decode()
+                    except UnicodeDecodeError:
+                        raise TuyaBLEDataFormatError() from None
+
+            _LOGGER.debug(
+                "%s: Received datapoint update, id: %s, type: %s: value: %s",
+                self.name,
+                id,
+                type.name,
+                value,
+            )
+            datapoints.append((id, type, value))
+            pos = next_pos
+
+        return TuyaBLEDatapointsEvent(timestamp, flags, datapoints)
+
+    def _parse_datapoints_v3(
+        self, timestamp: float, flags: int, data: bytes, start_pos: int
+    ) -> TuyaBLEDatapointsEvent:
+        """Parse datapoints with 1 byte id, type and length."""
+        return self._parse_datapoints(timestamp, flags, data, start_pos, ">BBB", 4)
+
+    def _parse_datapoints_v4(
+        self, timestamp: float, flags: int, data: bytes, start_pos: int
+    ) -> TuyaBLEDatapointsEvent:
+        """Parse datapoints with 1 byte id and type, and 2 bytes length."""
+        return self._parse_datapoints(timestamp, flags, data, start_pos, ">BBH", 4)
+
+    def _handle_command_or_response(
+        self, seq_num: int, response_to: int, code: TuyaBLECode, data: bytes
+    ) -> list[TuyaBLEEvent]:
+        events: list[TuyaBLEEvent] = []
+        result: int = 0
+
+        match code:
+            case TuyaBLECode.FUN_SENDER_DEVICE_INFO:
+                if len(data) < 46:
+                    raise TuyaBLEDataLengthError()
+
+                self.device_version = ("%s.%s") % (data[0], data[1])
+                self.protocol_version_str = ("%s.%s") % (data[2], data[3])
+                self.hardware_version = ("%s.%s") % (data[12], data[13])
+
+                self.protocol_version = data[2]
+                self.flags = data[4]
+                self.is_bound = data[5] != 0
+
+                srand = data[6:12]
+                self.session_key = hashlib.md5(self.local_key + srand).digest()
+                self.auth_key = data[14:46]
+                self._ciphers.clear()
+
+            case TuyaBLECode.FUN_SENDER_PAIR:
+                if len(data) != 1:
+                    raise TuyaBLEDataLengthError()
+                result = data[0]
+                if result == 2:
+                    _LOGGER.debug(
+                        "%s: Device is already paired",
+                        self.name,
+                    )
+                    result = 0
+                self.is_paired = result == 0
+
+            case TuyaBLECode.FUN_SENDER_DEVICE_STATUS:
+                if len(data) != 1:
+                    raise TuyaBLEDataLengthError()
+                result = data[0]
+
+            case TuyaBLECode.FUN_RECEIVE_TIME1_REQ:
+                if len(data) != 0:
+                    raise TuyaBLEDataLengthError()
+
+                timestamp = int(time.time_ns() / 1000000)
+                timezone = -int(time.timezone / 36)
+                data = str(timestamp).encode() + pack(">h", timezone)
+                events.append(TuyaBLEReplyEvent(code, data, seq_num))
+
+            case TuyaBLECode.FUN_RECEIVE_TIME2_REQ:
+                if len(data) != 0:
+                    raise TuyaBLEDataLengthError()
+
+                time_str: time.struct_time = time.localtime()
+                timezone = -int(time.timezone / 36)
+                data = pack(
+                    ">BBBBBBBh",
+                    time_str.tm_year % 100,
+                    time_str.tm_mon,
+                    time_str.tm_mday,
+                    time_str.tm_hour,
+                    time_str.tm_min,
+                    time_str.tm_sec,
+                    time_str.tm_wday,
+                    timezone,
+                )
+                events.append(TuyaBLEReplyEvent(code, data, seq_num))
+
+            case TuyaBLECode.FUN_RECEIVE_DP:
+                events.append(self._parse_datapoints_v3(time.time(), 0, data, 0))
+                events.append(TuyaBLEReplyEvent(code, bytes(0), seq_num))
+
+            case TuyaBLECode.FUN_RECEIVE_SIGN_DP:
+                if len(data) < 3:
+                    raise TuyaBLEDataLengthError()
+                dp_seq_num = int.from_bytes(data[:2], "big")
+                flags = data[2]
+                events.append(self._parse_datapoints_v3(time.time(), flags, data, 2))
+                data = pack(">HBB", dp_seq_num, flags, 0)
+                events.append(TuyaBLEReplyEvent(code, data, seq_num))
+
+            case TuyaBLECode.FUN_RECEIVE_TIME_DP:
+                timestamp: float
+                pos: int
+                timestamp, pos = self._parse_timestamp(data, 0)
+                events.append(self._parse_datapoints_v3(timestamp, 0, data, pos))
+                events.append(TuyaBLEReplyEvent(code, bytes(0), seq_num))
+
+            case TuyaBLECode.FUN_RECEIVE_SIGN_TIME_DP:
+                timestamp: float
+                pos: int
+                if len(data) < 3:
+                    raise TuyaBLEDataLengthError()
+                dp_seq_num = int.from_bytes(data[:2], "big")
+                flags = data[2]
+                timestamp, pos = self._parse_timestamp(data, 3)
+                events.append(self._parse_datapoints_v3(time.time(), flags, data, pos))
+                data = pack(">HBB", dp_seq_num, flags, 0)
+                events.append(TuyaBLEReplyEvent(code, data, seq_num))
+
+            case TuyaBLECode.FUN_RECEIVE_DP_V4:
+                if len(data) < 8:
+                    raise TuyaBLEDataLengthError()
+                _, dp_seq_num, dp_type, dp_mode, _ = unpack_from(">BIBBB", data)
+                events.append(self._parse_datapoints_v4(time.time(), dp_type, data, 8))
+                data = pack(">BIBBB", 0, dp_seq_num, dp_type, dp_mode, 0)
+                events.append(TuyaBLEReplyEvent(code, data, seq_num))
+
+            case TuyaBLECode.FUN_RECEIVE_TIME_DP_V4:
+                timestamp: float
+                pos: int
+                if len(data) < 8:
+                    raise TuyaBLEDataLengthError()
+                _, dp_seq_num, dp_type, dp_mode, _ = unpack_from(">BIBBB", data)
+                timestamp, pos = self._parse_timestamp(data, 8)
+                events.append(self._parse_datapoints_v4(timestamp, dp_type, data, pos))
+                data = pack(">BIBBB", 0, dp_seq_num, dp_type, dp_mode, 0)
+                events.append(TuyaBLEReplyEvent(code, data, seq_num))
+
+        if response_to != 0:
+            events.append(TuyaBLEResponseEvent(response_to, result))
+
+        return events
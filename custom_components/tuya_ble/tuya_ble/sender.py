@@ -0,0 +1,249 @@
+"""Sending of requests to Tuya BLE devices."""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import itertools
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+
+from .const import (
+    RESPONSE_TIMEOUT_INITIAL,
+    RESPONSE_TIMEOUT_MAX,
+    RESPONSE_TIMEOUT_MIN,
+    SEND_WINDOW,
+)
+
+# Gains of smoothed round-trip time and its variation, as in RFC 6298
+RTT_ALPHA = 1 / 8
+RTT_BETA = 1 / 4
+RTT_K = 4
+
+
+class TuyaBLERttEstimator:
+    """Estimates round-trip time of requests and derives response timeout.
+
+    Works like the TCP retransmission timer: timeout is the smoothed
+    round-trip time plus four times its variation, limited by floor and
+    ceiling. Every timeout doubles it until the next response is measured.
+    """
+
+    def __init__(
+        self,
+        min_timeout: float = RESPONSE_TIMEOUT_MIN,
+        max_timeout: float = RESPONSE_TIMEOUT_MAX,
+        initial_timeout: float = RESPONSE_TIMEOUT_INITIAL,
+    ) -> None:
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._initial_timeout = initial_timeout
+        self._srtt: float | None = None
+        self._rttvar = 0.0
+        self._backoff = 1
+        self._samples = 0
+        self._timeouts = 0
+
+    @property
+    def srtt(self) -> float | None:
+        """Smoothed round-trip time in seconds, None until first response."""
+        return self._srtt
+
+    @property
+    def rttvar(self) -> float:
+        """Variation of round-trip time in seconds."""
+        return self._rttvar
+
+    @property
+    def samples(self) -> int:
+        return self._samples
+
+    @property
+    def timeouts(self) -> int:
+        return self._timeouts
+
+    @property
+    def timeout(self) -> float:
+        """Time to wait for the response to the next request."""
+        if self._srtt is None:
+            timeout = self._initial_timeout
+        else:
+            timeout = self._srtt + RTT_K * self._rttvar
+        timeout = max(self.min_timeout, timeout) * self._backoff
+        return min(self.max_timeout, timeout)
+
+    def add_sample(self, rtt: float) -> None:
+        """Update estimate with measured round-trip time."""
+        if self._srtt is None:
+            self._srtt = rtt
+            self._rttvar = rtt / 2
+        else:
+            self._rttvar += RTT_BETA * (abs(self._srtt - rtt) - self._rttvar)
+            self._srtt += RTT_ALPHA * (rtt - self._srtt)
+        self._backoff = 1
+        self._samples += 1
+
+    def add_timeout(self) -> None:
+        """Back off after a request was not answered in time."""
+        if self.timeout < self.max_timeout:
+            self._backoff *= 2
+        self._timeouts += 1
+
+
+class TuyaBLESendPriority(IntEnum):
+    """Priority of outgoing frame, lower value is sent first."""
+
+    RESPONSE = 0
+    COMMAND = 1
+    POLL = 2
+
+
+@dataclass
+class TuyaBLESendStats:
+    """Statistics of frames sent with one priority."""
+
+    sent: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.sent if self.sent else 0.0
+
+
+@dataclass
+class TuyaBLEBurstStats:
+    """Statistics of frames written together in bursts."""
+
+    bursts: int = 0
+    frames: int = 0
+    last_burst: int = 0
+    max_burst: int = 0
+
+    @property
+    def average_burst(self) -> float:
+        return self.frames / self.bursts if self.bursts else 0.0
+
+    def add_burst(self, frames: int) -> None:
+        self.bursts += 1
+        self.frames += frames
+        self.last_burst = frames
+        self.max_burst = max(self.max_burst, frames)
+
+
+class _TuyaBLEPrioritySemaphore:
+    """Semaphore which wakes waiters by priority, then in arrival order."""
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+        self._acquired = 0
+        self._order = itertools.count()
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def acquired(self) -> int:
+        return self._acquired
+
+    async def acquire(self, priority: int) -> None:
+        if self._acquired < self.value and not self._waiters:
+            self._acquired += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._order), future)
+        bisect.insort(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Woken up and cancelled at the same time, pass the turn on
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+            raise
+
+    def release(self) -> None:
+        self._acquired -= 1
+        while self._waiters and self._acquired < self.value:
+            _, _, future = self._waiters.pop(0)
+            if not future.done():
+                self._acquired += 1
+                future.set_result(None)
+
+
+class TuyaBLESendQueue:
+    """Orders outgoing frames of one device.
+
+    Frames are written one at a time, waiting frames are written by
+    priority and in arrival order within the same priority. Requests which
+    wait for response additionally take a place in the window, which
+    limits how many of them may be outstanding at the same time.
+    """
+
+    def __init__(self, window: int = SEND_WINDOW) -> None:
+        self._writer = _TuyaBLEPrioritySemaphore(1)
+        self._window = _TuyaBLEPrioritySemaphore(window)
+        self._stats = {
+            priority: TuyaBLESendStats() for priority in TuyaBLESendPriority
+        }
+
+    @property
+    def window(self) -> int:
+        return self._window.value
+
+    @window.setter
+    def window(self, value: int) -> None:
+        self._window.value = value
+
+    @property
+    def depth(self) -> int:
+        """Count of frames waiting to be written."""
+        return self._writer.waiting + self._window.waiting
+
+    @property
+    def outstanding(self) -> int:
+        """Count of requests waiting for response."""
+        return self._window.acquired
+
+    @property
+    def busy(self) -> bool:
+        return self._writer.acquired > 0 or self.depth > 0
+
+    def stats(self, priority: TuyaBLESendPriority) -> TuyaBLESendStats:
+        return self._stats[priority]
+
+    def _add_wait(
+        self, priority: TuyaBLESendPriority, wait: float, sent: bool
+    ) -> None:
+        stats = self._stats[priority]
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        if sent:
+            stats.sent += 1
+
+    @asynccontextmanager
+    async def request(self, priority: TuyaBLESendPriority) -> AsyncIterator[None]:
+        """Hold a place in the window while waiting for response."""
+        start = time.monotonic()
+        await self._window.acquire(priority)
+        self._add_wait(priority, time.monotonic() - start, False)
+        try:
+            yield
+        finally:
+            self._window.release()
+
+    @asynccontextmanager
+    async def write(self, priority: TuyaBLESendPriority) -> AsyncIterator[None]:
+        """Hold exclusive access to the write characteristic."""
+        start = time.monotonic()
+        await self._writer.acquire(priority)
+        self._add_wait(priority, time.monotonic() - start, True)
+        try:
+            yield
+        finally:
+            self._writer.release()
@@ -3,11 +3,10 @@ from __future__ import annotations
 import asyncio
 import hashlib
 import logging
-import secrets
 import time
-from collections.abc import Callable
-from struct import pack, unpack
-from dataclasses import dataclass
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
 from typing import Any
 
 import json
@@ -29,28 +28,50 @@ from homeassistant.components.tuya.const import (
     DPCode,
 )
 
+from ..base import EnumTypeData, IntegerTypeData
 from ..const import (
     DPType,
 )
 
+from .capture import TuyaBLECaptureRecordType, TuyaBLECaptureWriter
+from .connection import (
+    TuyaBLECircuitBreaker,
+    TuyaBLECircuitBreakerState,
+    TuyaBLEConnectionScheduler,
+    TuyaBLEConnector,
+    TuyaBLEReconnectPolicy,
+    connection_scheduler,
+    get_adapter,
+)
 from .const import (
     CHARACTERISTIC_NOTIFY,
     CHARACTERISTIC_WRITE,
     GATT_MTU,
     MANUFACTURER_DATA_ID,
-    RESPONSE_WAIT_TIMEOUT,
     SERVICE_UUID,
     TuyaBLECode,
     TuyaBLEDataPointType,
 )
 from .exceptions import (
-    TuyaBLEDataCRCError,
-    TuyaBLEDataFormatError,
-    TuyaBLEDataLengthError,
     TuyaBLEDeviceError,
+    TuyaBLEDisconnectedError,
     TuyaBLEEnumValueError,
 )
 from .manager import AbstaractTuyaBLEDeviceManager, TuyaBLEDeviceCredentials
+from .protocol import (
+    TuyaBLEDatapointsEvent,
+    TuyaBLEEvent,
+    TuyaBLEProtocol,
+    TuyaBLEReplyEvent,
+    TuyaBLEResponseEvent,
+    encode_datapoint_value,
+)
+from .sender import (
+    TuyaBLEBurstStats,
+    TuyaBLERttEstimator,
+    TuyaBLESendPriority,
+    TuyaBLESendQueue,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -101,22 +122,7 @@ class TuyaBLEDataPoint:
         self._value = value
 
     def _get_value(self) -> bytes:
-        match self._type:
-            case TuyaBLEDataPointType.DT_RAW | TuyaBLEDataPointType.DT_BITMAP:
-                return self._value
-            case TuyaBLEDataPointType.DT_BOOL:
-                return pack(">B", 1 if self._value else 0)
-            case TuyaBLEDataPointType.DT_VALUE:
-                return pack(">i", self._value)
-            case TuyaBLEDataPointType.DT_ENUM:
-                if self._value > 0xFFFF:
-                    return pack(">I", self._value)
-                elif self._value > 0xFF:
-                    return pack(">H", self._value)
-                else:
-                    return pack(">B", self._value)
-            case TuyaBLEDataPointType.DT_STRING:
-                return self._value.encode()
+        return encode_datapoint_value(self._type, self._value)
 
     @property
     def id(self) -> int:
@@ -148,7 +154,12 @@ class TuyaBLEDataPoint:
     def __str__(self):
         return f"{self}"
 
-    async def set_value(self, value: bytes | bool | int | str) -> None:
+    async def set_value(self, value: bytes | bool | int | str) -> bool:
+        self._set_value(value)
+        return await self._owner._update_from_user(self._id)
+
+    def _set_value(self, value: bytes | bool | int | str) -> None:
+        """Apply new value locally without sending it."""
         match self._type:
             case TuyaBLEDataPointType.DT_RAW | TuyaBLEDataPointType.DT_BITMAP:
                 self._value = bytes(value)
@@ -167,7 +178,7 @@ class TuyaBLEDataPoint:
                 self._value = str(value)
 
         self._changed_by_device = False
-        await self._owner._update_from_user(self._id)
+        self._owner._value_changed(self)
 
 
 class TuyaBLEDataPoints:
@@ -199,16 +210,26 @@ class TuyaBLEDataPoints:
             return datapoint
         datapoint = TuyaBLEDataPoint(self, id, time.time(), 0, type, value)
         self._datapoints[id] = datapoint
+        self._value_changed(datapoint)
         return datapoint
 
     def begin_update(self) -> None:
         self._update_started += 1
 
-    async def end_update(self) -> None:
+    async def end_update(self) -> bool:
+        result = True
         if self._update_started > 0:
             self._update_started -= 1
             if self._update_started == 0 and len(self._updated_datapoints) > 0:
-                await self._owner._send_datapoints(self._updated_datapoints)
+                datapoint_ids = self._updated_datapoints
+                self._updated_datapoints = []
+                result = await self._owner._send_datapoints(datapoint_ids)
+        return result
+
+    def cancel_update(self) -> None:
+        if self._update_started > 0:
+            self._update_started -= 1
+            if self._update_started == 0:
                 self._updated_datapoints = []
 
     def _update_from_device(
@@ -223,20 +244,22 @@ class TuyaBLEDataPoints:
         if dp:
             dp._update_from_device(timestamp, flags, type, value)
         else:
-            self._datapoints[dp_id] = TuyaBLEDataPoint(
-                self, dp_id, timestamp, flags, type, value
-            )
+            dp = TuyaBLEDataPoint(self, dp_id, timestamp, flags, type, value)
+            self._datapoints[dp_id] = dp
+        self._value_changed(dp)
 
-    async def _update_from_user(self, dp_id: int) -> None:
+    def _value_changed(self, datapoint: TuyaBLEDataPoint) -> None:
+        self._owner._update_status(datapoint.id, datapoint.value)
+
+    async def _update_from_user(self, dp_id: int) -> bool:
         if self._update_started > 0:
             if dp_id in self._updated_datapoints:
                 self._updated_datapoints.remove(dp_id)
             self._updated_datapoints.append(dp_id)
+            return True
         else:
-            await self._owner._send_datapoints([dp_id])
-
+            return await self._owner._send_datapoints([dp_id])
 
-global_connect_lock = asyncio.Lock()
 
 @dataclass
 class TuyaBLEDeviceFunction:
@@ -252,57 +275,179 @@ class TuyaBLEDeviceFunction:
                 value = v
         super().__setattr__(name, value)
 
+
+@dataclass(frozen=True)
+class TuyaBLEDataPointSchema:
+    """Type metadata of one dpcode, parsed once from its cloud values."""
+
+    code: str
+    dp_id: int
+    type: DPType | None
+    values: str | dict | list | None
+    integer: IntegerTypeData | None = None
+    enum: EnumTypeData | None = None
+    # Index of every enum value, as sent to the device
+    enum_index: Mapping[str, int] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+
+    @classmethod
+    def compile(cls, function: TuyaBLEDeviceFunction) -> TuyaBLEDataPointSchema:
+        try:
+            type = DPType(function.type)
+        except ValueError:
+            type = None
+        values = function.values
+        integer: IntegerTypeData | None = None
+        enum: EnumTypeData | None = None
+        enum_index: dict[str, int] = {}
+        if type == DPType.INTEGER and isinstance(values, dict):
+            try:
+                integer = IntegerTypeData.from_json(function.code, values)
+            except (KeyError, TypeError, ValueError):
+                _LOGGER.debug("Invalid integer values of %s", function.code)
+        elif type == DPType.ENUM and isinstance(values, dict):
+            if isinstance(enum_values := values.get("range"), list):
+                enum = EnumTypeData(function.code, enum_values)
+                for index, value in enumerate(enum_values):
+                    enum_index.setdefault(value, index)
+        return cls(
+            function.code,
+            function.dp_id,
+            type,
+            values,
+            integer,
+            enum,
+            MappingProxyType(enum_index),
+        )
+
+
+@dataclass(frozen=True)
+class TuyaBLEDeviceSchema:
+    """Immutable dpcode lookup of the device functions and status ranges."""
+
+    function: Mapping[str, TuyaBLEDataPointSchema] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    status_range: Mapping[str, TuyaBLEDataPointSchema] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+
+    @classmethod
+    def compile(
+        cls,
+        function: dict[str, TuyaBLEDeviceFunction],
+        status_range: dict[str, TuyaBLEDeviceFunction],
+    ) -> TuyaBLEDeviceSchema:
+        return cls(
+            MappingProxyType(
+                {
+                    code: TuyaBLEDataPointSchema.compile(f)
+                    for code, f in function.items()
+                }
+            ),
+            MappingProxyType(
+                {
+                    code: TuyaBLEDataPointSchema.compile(f)
+                    for code, f in status_range.items()
+                }
+            ),
+        )
+
+    def lookup_order(
+        self, prefer_function: bool = False
+    ) -> tuple[Mapping[str, TuyaBLEDataPointSchema], ...]:
+        """Maps to search for a dpcode, status range first by default."""
+        if prefer_function:
+            return (self.function, self.status_range)
+        return (self.status_range, self.function)
+
+    def get(
+        self, dpcode: str | None, prefer_function: bool = False
+    ) -> TuyaBLEDataPointSchema | None:
+        """Schema of the dpcode, None if the device does not have it."""
+        for schemas in self.lookup_order(prefer_function):
+            if (schema := schemas.get(dpcode)) is not None:
+                return schema
+        return None
+
+
 class TuyaBLEDevice:
     def __init__(
         self,
         device_manager: AbstaractTuyaBLEDeviceManager,
         ble_device: BLEDevice,
         advertisement_data: AdvertisementData | None = None,
+        gatt_mtu: int | None = None,
+        scheduler: TuyaBLEConnectionScheduler | None = None,
+        reconnect_policy: TuyaBLEReconnectPolicy | None = None,
+        connector: TuyaBLEConnector | None = None,
+        callback_delay: float = 0.0,
     ) -> None:
-        """Init the TuyaBLE."""
+        """Init the TuyaBLE.
+
+        Datapoints updated within callback_delay seconds, or in the same
+        event loop iteration when it is 0, are reported in one callback.
+        """
         self._device_manager = device_manager
         self._device_info: TuyaBLEDeviceCredentials | None = None
         self._ble_device = ble_device
         self._advertisement_data = advertisement_data
-        self._operation_lock = asyncio.Lock()
+        self._send_queue = TuyaBLESendQueue()
+        self._pending_responses: list[tuple[TuyaBLECode, bytes, int]] = []
+        self._responses_writer: asyncio.Task | None = None
+        self._responses_stats = TuyaBLEBurstStats()
         self._connect_lock = asyncio.Lock()
+        self._scheduler = scheduler or connection_scheduler
+        self._connect_wait_time = 0.0
+        self._reconnect_policy = reconnect_policy or TuyaBLEReconnectPolicy()
+        self._connector = connector or establish_connection
+        self._breaker = TuyaBLECircuitBreaker()
+        self._breaker_timer: asyncio.TimerHandle | None = None
+        self._reconnect_task: asyncio.Task | None = None
         self._client: BleakClientWithServiceCache | None = None
         self._expected_disconnect = False
         self._connected_callbacks: list[Callable[[], None]] = []
         self._callbacks: list[Callable[[list[TuyaBLEDataPoint]], None]] = []
+        self._callback_delay = callback_delay
+        self._pending_callback_datapoints: dict[int, TuyaBLEDataPoint] = {}
+        self._pending_changed_ids: set[int] = set()
+        self._callbacks_handle: asyncio.Handle | None = None
         self._disconnected_callbacks: list[Callable[[], None]] = []
         self._connection_status_callbacks: list[Callable[[], None]] = []
-        self._current_seq_num = 1
         self._seq_num_lock = asyncio.Lock()
 
-        self._is_bound = False
-        self._flags = 0
-        self._protocol_version = 2
-
-        self._device_version: str = ""
-        self._protocol_version_str: str = ""
-        self._hardware_version: str = ""
-
         self._device_info: TuyaBLEDeviceCredentials | None = None
 
-        self._auth_key: bytes | None = None
-        self._local_key: bytes | None = None
-        self._login_key: bytes | None = None
-        self._session_key: bytes | None = None
-
-        self._is_paired = False
+        self._protocol = TuyaBLEProtocol(
+            ble_device.address, max(GATT_MTU, gatt_mtu or GATT_MTU)
+        )
+        self._gatt_mtu_override = gatt_mtu
 
-        self._input_buffer: bytearray | None = None
-        self._input_expected_packet_num = 0
-        self._input_expected_length = 0
         self._input_expected_responses: dict[int,
                                              asyncio.Future[int] | None] = {}
         # self._input_future: asyncio.Future[int] | None = None
+        self._rtt = TuyaBLERttEstimator()
 
         self._datapoints = TuyaBLEDataPoints(self)
+        self._datapoints_write_in_flight = False
+        self._next_datapoints: dict[
+            int, tuple[TuyaBLEDataPointType, bytes | bool | int | str]
+        ] = {}
+        self._next_datapoints_future: asyncio.Future[bool] | None = None
+        self._datapoints_write_tasks: set[asyncio.Task] = set()
+        self._dropped_datapoint_writes = 0
 
         self._function = {}
         self._status_range = {}
+        # Codes of every dp id and current values by code, kept up to date
+        # as datapoints change so status is not rebuilt on every read
+        self._dpcodes: dict[int, list[str]] = {}
+        self._status: dict[str, Any] = {}
+        self._status_view = MappingProxyType(self._status)
+        self._schema = TuyaBLEDeviceSchema()
+
+        self._capture: TuyaBLECaptureWriter | None = None
 
 
     def set_ble_device_and_advertisement_data(
@@ -317,17 +462,6 @@ class TuyaBLEDevice:
         if await self._update_device_info():
             self._decode_advertisement_data()
             
-    def _build_pairing_request(self) -> bytes:
-        result = bytearray()
-
-        result += self._device_info.uuid.encode()
-        result += self._local_key
-        result += self._device_info.device_id.encode()
-        for _ in range(44 - len(result)):
-            result += b"\x00"
-
-        return result
-
     async def pair(self) -> None:
         """
         _LOGGER.debug("%s: Sending pairing request: %s",
@@ -338,6 +472,11 @@ class TuyaBLEDevice:
             TuyaBLECode.FUN_SENDER_PAIR, self._build_pairing_request()
         )
 
+    def _build_pairing_request(self) -> bytes:
+        return self._protocol.build_pairing_request(
+            self._device_info.uuid, self._device_info.device_id
+        )
+
     async def reconnect(self) -> None:
         _LOGGER.debug("%s: Reconnecting", self.address)
         await self._ensure_connected()
@@ -349,7 +488,11 @@ class TuyaBLEDevice:
 
     async def update(self) -> None:
         _LOGGER.debug("%s: Updating", self.address)
-        await self._send_packet(TuyaBLECode.FUN_SENDER_DEVICE_STATUS, bytes())
+        await self._send_packet(
+            TuyaBLECode.FUN_SENDER_DEVICE_STATUS,
+            bytes(),
+            priority=TuyaBLESendPriority.POLL,
+        )
 
     async def _update_device_info(self) -> bool:
         if self._device_info is None:
@@ -358,8 +501,9 @@ class TuyaBLEDevice:
                     self._ble_device.address, False
                 )
             if self._device_info:
-                self._local_key = self._device_info.local_key[:6].encode()
-                self._login_key = hashlib.md5(self._local_key).digest()
+                self._protocol.set_local_key(
+                    self._device_info.local_key[:6].encode()
+                )
 
                 self.append_functions(self._device_info.functions, self._device_info.status_range)
 
@@ -376,6 +520,26 @@ class TuyaBLEDevice:
                 dpcode = f.get("code")
                 if dpcode:
                     self.status_range[dpcode] = TuyaBLEDeviceFunction(**f)
+        self._index_dpcodes()
+        self._schema = TuyaBLEDeviceSchema.compile(self.function, self.status_range)
+
+    def _index_dpcodes(self) -> None:
+        """Rebuild dp id to codes map and status after functions change."""
+        dpcode_ids = {code: f.dp_id for code, f in self.status_range.items()}
+        # Function takes precedence when the code is in both
+        dpcode_ids.update((code, f.dp_id) for code, f in self.function.items())
+        self._dpcodes.clear()
+        for dpcode, dp_id in dpcode_ids.items():
+            self._dpcodes.setdefault(dp_id, []).append(dpcode)
+        self._status.clear()
+        for dp_id, dpcodes in self._dpcodes.items():
+            if datapoint := self._datapoints[dp_id]:
+                for dpcode in dpcodes:
+                    self._status[dpcode] = datapoint.value
+
+    def _update_status(self, dp_id: int, value: bytes | bool | int | str) -> None:
+        for dpcode in self._dpcodes.get(dp_id, ()):
+            self._status[dpcode] = value
 
     def update_description(self, description: TuyaBLEEntityDescription | None) -> None:
         if not description:
@@ -401,6 +565,8 @@ class TuyaBLEDevice:
                 if f := self.status_range.get(key) and not f.values:
                     f.values = values
 
+        self._schema = TuyaBLEDeviceSchema.compile(self.function, self.status_range)
+
     def _decode_advertisement_data(self) -> None:
         raw_product_id: bytes | None = None
         # raw_product_key: bytes | None = None
@@ -421,8 +587,8 @@ class TuyaBLEDevice:
                     MANUFACTURER_DATA_ID
                 )
                 if manufacturer_data and len(manufacturer_data) > 6:
-                    self._is_bound = (manufacturer_data[0] & 0x80) != 0
-                    self._protocol_version = manufacturer_data[1]
+                    self._protocol.is_bound = (manufacturer_data[0] & 0x80) != 0
+                    self._protocol.protocol_version = manufacturer_data[1]
                     raw_uuid = manufacturer_data[6:]
                     if raw_product_id:
                         key = hashlib.md5(raw_product_id).digest()
@@ -448,6 +614,15 @@ class TuyaBLEDevice:
         """Return if connected to device."""
         return self._client is not None and self._client.is_connected and self._is_paired
 
+    @property
+    def _is_paired(self) -> bool:
+        return self._protocol.is_paired
+
+    @property
+    def protocol(self) -> TuyaBLEProtocol:
+        """Transport independent protocol state of the device."""
+        return self._protocol
+
     @property
     def rssi(self) -> int | None:
         """Get the rssi of the device."""
@@ -512,17 +687,67 @@ class TuyaBLEDevice:
     def status_range(self) -> dict(str, dict):
         return self._status_range
 
+    @property
+    def schema(self) -> TuyaBLEDeviceSchema:
+        """Datapoints schema compiled from function and status range."""
+        return self._schema
+
     @property
     def device_version(self) -> str:
-        return self._device_version
+        return self._protocol.device_version
 
     @property
     def hardware_version(self) -> str:
-        return self._hardware_version
+        return self._protocol.hardware_version
 
     @property
     def protocol_version(self) -> str:
-        return self._protocol_version_str
+        return self._protocol.protocol_version_str
+
+    @property
+    def gatt_mtu(self) -> int:
+        """Max size of data written to the device at once."""
+        return self._protocol.gatt_mtu
+
+    @gatt_mtu.setter
+    def gatt_mtu(self, value: int | None) -> None:
+        """Override size of written data, None to use negotiated MTU."""
+        self._gatt_mtu_override = value
+        self._update_gatt_mtu()
+
+    @property
+    def adapter(self) -> str:
+        """Adapter or proxy used to connect to the device."""
+        return get_adapter(self._ble_device)
+
+    @property
+    def breaker(self) -> TuyaBLECircuitBreaker:
+        """Circuit breaker guarding connection attempts."""
+        return self._breaker
+
+    @property
+    def breaker_state(self) -> TuyaBLECircuitBreakerState:
+        return self._breaker.state
+
+    @property
+    def send_queue(self) -> TuyaBLESendQueue:
+        """Queue of outgoing frames, with depth and wait time statistics."""
+        return self._send_queue
+
+    @property
+    def responses_stats(self) -> TuyaBLEBurstStats:
+        """Count of responses written to the device per burst."""
+        return self._responses_stats
+
+    @property
+    def rtt(self) -> TuyaBLERttEstimator:
+        """Round-trip time estimate used for response timeouts."""
+        return self._rtt
+
+    @property
+    def connect_wait_time(self) -> float:
+        """Seconds the last connection attempt waited for a free slot."""
+        return self._connect_wait_time
 
     @property
     def datapoints(self) -> TuyaBLEDataPoints:
@@ -530,21 +755,14 @@ class TuyaBLEDevice:
         return self._datapoints
 
     @property
-    def status(self) -> dict[str, Any]:
-        """Get current datapoints values."""
-
-        result = {}
-        dps = self.datapoints._datapoints
-        if dps:
-            order = [self.status_range, self.function]
-            for functions in order:
-                for dpcode in functions:
-                    f = functions[dpcode]
-                    dpid = f.dp_id
-                    v = dps.get(dpid)
-                    if v:
-                        result[dpcode] = v.value
-        return result
+    def dropped_datapoint_writes(self) -> int:
+        """Count of values replaced by newer ones before they were sent."""
+        return self._dropped_datapoint_writes
+
+    @property
+    def status(self) -> Mapping[str, Any]:
+        """Get current datapoints values by code, a read-only live view."""
+        return self._status_view
 
     def get_or_create_datapoint(
         self,
@@ -554,6 +772,105 @@ class TuyaBLEDevice:
     ) -> TuyaBLEDataPoint:
         """Get datapoints exposed by device."""
 
+    async def set_datapoints(
+        self,
+        values: dict[int, tuple[TuyaBLEDataPointType, bytes | bool | int | str]],
+    ) -> bool:
+        """Set values of several datapoints in a single transaction.
+
+        All values are sent in one frame, returns True if the device
+        acknowledged it. While previous transaction is in flight values are
+        merged into the next one, where the newest value of every datapoint
+        replaces the older ones. Merged values are applied to the datapoints
+        right away, so a value built from the current one, as raw program of
+        the fingerbot, includes the edits still waiting to be sent.
+        """
+        if self._datapoints_write_in_flight:
+            for dp_id, (type, value) in values.items():
+                # Raw values are edited field by field from the merged one
+                if dp_id in self._next_datapoints and type not in (
+                    TuyaBLEDataPointType.DT_RAW,
+                    TuyaBLEDataPointType.DT_BITMAP,
+                ):
+                    self._dropped_datapoint_writes += 1
+                self._datapoints.get_or_create(dp_id, type, value)._set_value(
+                    value
+                )
+            self._next_datapoints.update(values)
+            if self._next_datapoints_future is None:
+                self._next_datapoints_future = asyncio.get_running_loop().create_future()
+            return await asyncio.shield(self._next_datapoints_future)
+
+        self._datapoints_write_in_flight = True
+        try:
+            return await self._write_datapoints(values)
+        finally:
+            self._write_next_datapoints()
+
+    def _write_next_datapoints(self) -> None:
+        """Start writing of the datapoints merged during previous write."""
+        values = self._next_datapoints
+        future = self._next_datapoints_future
+        self._next_datapoints = {}
+        self._next_datapoints_future = None
+        if not values:
+            self._datapoints_write_in_flight = False
+            return
+
+        async def write() -> None:
+            try:
+                result = await self._write_datapoints(values)
+            except Exception as ex:
+                future.set_exception(ex)
+            except BaseException:
+                self._cancel_next_datapoints()
+                raise
+            else:
+                future.set_result(result)
+            self._write_next_datapoints()
+
+        task = asyncio.create_task(write())
+        self._datapoints_write_tasks.add(task)
+        task.add_done_callback(self._datapoints_write_tasks.discard)
+        # Callers waiting for the write must not wait forever when it is
+        # cancelled, even before it started; no-op once the result is set
+        task.add_done_callback(lambda _: future.cancel())
+
+    def _cancel_next_datapoints(self) -> None:
+        """Cancel the datapoints merged for the next write."""
+        if self._next_datapoints_future is not None:
+            self._next_datapoints_future.cancel()
+        self._next_datapoints = {}
+        self._next_datapoints_future = None
+        self._datapoints_write_in_flight = False
+
+    async def _write_datapoints(
+        self,
+        values: dict[int, tuple[TuyaBLEDataPointType, bytes | bool | int | str]],
+    ) -> bool:
+        self._datapoints.begin_update()
+        try:
+            for dp_id, (type, value) in values.items():
+                datapoint = self._datapoints.get_or_create(dp_id, type, value)
+                await datapoint.set_value(value)
+        except:
+            self._datapoints.cancel_update()
+            raise
+        try:
+            return await self._datapoints.end_update()
+        except TuyaBLEDeviceError:
+            _LOGGER.error(
+                "%s: Device rejected datapoints update",
+                self.address,
+                exc_info=True,
+            )
+            return False
+        except TuyaBLEDisconnectedError:
+            _LOGGER.warning(
+                "%s: Connection lost while updating datapoints", self.address
+            )
+            return False
+
     def _fire_connected_callbacks(self) -> None:
         """Fire the callbacks."""
         for callback in self._connected_callbacks:
@@ -575,11 +892,48 @@ class TuyaBLEDevice:
         for callback in self._callbacks:
             callback(datapoints)
 
+    def _schedule_callbacks(self, datapoints: list[TuyaBLEDataPoint]) -> None:
+        """Merge updated datapoints until the callbacks are fired.
+
+        Status is reported in several frames, so each one would otherwise
+        update every entity again. A datapoint changed in any of the merged
+        frames is passed with changed_by_device set, a later frame reporting
+        the same value again must not hide the change.
+        """
+        for datapoint in datapoints:
+            self._pending_callback_datapoints[datapoint.id] = datapoint
+            if datapoint.changed_by_device:
+                self._pending_changed_ids.add(datapoint.id)
+        if self._callbacks_handle is None:
+            loop = asyncio.get_running_loop()
+            if self._callback_delay > 0:
+                self._callbacks_handle = loop.call_later(
+                    self._callback_delay, self._fire_pending_callbacks
+                )
+            else:
+                self._callbacks_handle = loop.call_soon(
+                    self._fire_pending_callbacks
+                )
+
+    def _fire_pending_callbacks(self) -> None:
+        self._callbacks_handle = None
+        datapoints = list(self._pending_callback_datapoints.values())
+        self._pending_callback_datapoints = {}
+        for datapoint in datapoints:
+            datapoint._changed_by_device = datapoint.id in self._pending_changed_ids
+        self._pending_changed_ids = set()
+        if datapoints:
+            self._fire_callbacks(datapoints)
+
     def register_callback(
         self,
         callback: Callable[[list[TuyaBLEDataPoint]], None],
     ) -> Callable[[], None]:
-        """Register a callback to be called when the state changes."""
+        """Register a callback to be called when the state changes.
+
+        Callback gets every reported datapoint, changed_by_device tells the
+        ones which value differs from the one known before.
+        """
 
         def unregister_callback() -> None:
             self._callbacks.remove(callback)
@@ -619,6 +973,31 @@ class TuyaBLEDevice:
         self._connection_status_callbacks.append(callback)
         return unregister_callback
 
+    async def start_capture(self, path: str) -> None:
+        """Append raw notifications and written packets to capture file."""
+        # Previous writer may append to the same file until it is closed
+        while self._capture:
+            await self.stop_capture()
+        _LOGGER.debug("%s: Capturing traffic to %s", self.address, path)
+        self._capture = TuyaBLECaptureWriter(path)
+        if self._client and self._client.is_connected:
+            self._capture.write(TuyaBLECaptureRecordType.CONNECTED)
+
+    async def stop_capture(self) -> None:
+        """Stop capturing and wait until the capture file is closed."""
+        capture = self._capture
+        if capture:
+            self._capture = None
+            _LOGGER.debug(
+                "%s: Captured %s records", self.address, capture.records
+            )
+            capture.close()
+            await asyncio.get_running_loop().run_in_executor(None, capture.join)
+
+    @property
+    def capturing(self) -> bool:
+        return self._capture is not None
+
     async def start(self):
         """Start the TuyaBLE."""
         _LOGGER.debug("%s: Starting...", self.address)
@@ -628,11 +1007,26 @@ class TuyaBLEDevice:
         """Stop the TuyaBLE."""
         _LOGGER.debug("%s: Stop", self.address)
         await self._execute_disconnect()
+        await self.stop_capture()
+        for task in list(self._datapoints_write_tasks):
+            task.cancel()
+        if self._breaker_timer is not None:
+            self._breaker_timer.cancel()
+            self._breaker_timer = None
+        self._cancel_next_datapoints()
+        if self._callbacks_handle is not None:
+            self._callbacks_handle.cancel()
+            self._callbacks_handle = None
+        self._pending_callback_datapoints = {}
+        self._pending_changed_ids = set()
 
     def _disconnected(self, client: BleakClientWithServiceCache) -> None:
         """Disconnected callback."""
         was_paired = self._is_paired
-        self._is_paired = False
+        self._protocol.reset()
+        if self._capture:
+            self._capture.write(TuyaBLECaptureRecordType.DISCONNECTED)
+        self._fail_expected_responses()
         if self._expected_disconnect:
             _LOGGER.debug(
                 "%s: Disconnected from device; RSSI: %s",
@@ -667,7 +1061,7 @@ class TuyaBLEDevice:
                     self.address,
                     self.rssi,
                 )
-                asyncio.create_task(self._reconnect())
+                self._schedule_reconnect()
         else:
             _LOGGER.warning(
                 "%s: Device unexpectedly disconnected; RSSI: %s",
@@ -689,19 +1083,24 @@ class TuyaBLEDevice:
 
     async def _execute_disconnect(self) -> None:
         """Execute disconnection."""
+        if self._reconnect_task and not self._reconnect_task.done():
+            self._reconnect_task.cancel()
         async with self._connect_lock:
             client = self._client
             self._expected_disconnect = True
             self._client = None
+            self._protocol.reset()
+            if self._capture:
+                self._capture.write(TuyaBLECaptureRecordType.DISCONNECTED)
+            self._fail_expected_responses()
             if client and client.is_connected:
                 await client.stop_notify(CHARACTERISTIC_NOTIFY)
                 await client.disconnect()
         async with self._seq_num_lock:
-            self._current_seq_num = 1
+            self._protocol.reset_seq_num()
 
     async def _ensure_connected(self) -> None:
         """Ensure connection to device is established."""
-        global global_connect_lock
         if self._expected_disconnect:
             return
         if self._connect_lock.locked():
@@ -718,22 +1117,35 @@ class TuyaBLEDevice:
             await asyncio.sleep(0.01)
             if self._client and self._client.is_connected and self._is_paired:
                 return
-            attempts_count = 100
-            while attempts_count > 0:
-                attempts_count -= 1
-                if attempts_count == 0:
-                    _LOGGER.error(
-                        "%s: Connecting, all attempts failed; RSSI: %s",
-                        self.address,
-                        self.rssi,
+            if not self._breaker.allow():
+                _LOGGER.debug(
+                    "%s: Not connecting, device was unreachable;"
+                    " next attempt in %.0fs",
+                    self.address,
+                    self._breaker.retry_after,
+                )
+                raise BleakNotFoundError()
+            policy = self._reconnect_policy
+            for attempt in range(policy.attempts):
+                if attempt > 0:
+                    delay = policy.get_delay(attempt - 1)
+                    _LOGGER.debug(
+                        "%s: Connecting again in %.1fs", self.address, delay
                     )
-                    raise BleakNotFoundError()
+                    await asyncio.sleep(delay)
+                    if self._expected_disconnect:
+                        return
                 try:
-                    async with global_connect_lock:
+                    adapter = get_adapter(self._ble_device)
+                    async with self._scheduler.slot(adapter) as wait_time:
+                        self._connect_wait_time = wait_time
                         _LOGGER.debug(
-                            "%s: Connecting; RSSI: %s", self.address, self.rssi
+                            "%s: Connecting via %s; RSSI: %s",
+                            self.address,
+                            adapter,
+                            self.rssi,
                         )
-                        client = await establish_connection(
+                        client = await self._connector(
                             BleakClientWithServiceCache,
                             self._ble_device,
                             self.address,
@@ -763,6 +1175,8 @@ class TuyaBLEDevice:
                     _LOGGER.debug("%s: Connected; RSSI: %s",
                                   self.address, self.rssi)
                     self._client = client
+                    if self._capture:
+                        self._capture.write(TuyaBLECaptureRecordType.CONNECTED)
                     try:
                         await self._client.start_notify(
                             CHARACTERISTIC_NOTIFY, self._notification_handler
@@ -772,6 +1186,7 @@ class TuyaBLEDevice:
                         _LOGGER.error("%s: starting notifications failed",
                                       self.address, exc_info=True)
                         continue
+                    self._update_gatt_mtu()
                 else:
                     continue
 
@@ -823,6 +1238,15 @@ class TuyaBLEDevice:
                     continue
 
                 break
+            else:
+                self._set_breaker_result(False)
+                _LOGGER.error(
+                    "%s: Connecting, all attempts failed; RSSI: %s",
+                    self.address,
+                    self.rssi,
+                )
+                raise BleakNotFoundError()
+            self._set_breaker_result(True)
 
         if self._client:
             if self._client.is_connected:
@@ -837,128 +1261,93 @@ class TuyaBLEDevice:
         else:
             _LOGGER.error("%s: No client device", self.address)
 
+    def _set_breaker_result(self, success: bool) -> None:
+        state = self._breaker.state
+        if success:
+            self._breaker.record_success()
+        else:
+            self._breaker.record_failure()
+        if self._breaker.state != state:
+            _LOGGER.debug(
+                "%s: Circuit breaker %s", self.address, self._breaker.state.value
+            )
+            self._fire_connection_status_callbacks()
+        if self._breaker_timer is not None:
+            self._breaker_timer.cancel()
+            self._breaker_timer = None
+        if self._breaker.state == TuyaBLECircuitBreakerState.OPEN:
+            # Breaker gets half-open by time only, report it when it does
+            self._breaker_timer = asyncio.get_running_loop().call_later(
+                self._breaker.retry_after, self._breaker_half_open
+            )
+
+    def _breaker_half_open(self) -> None:
+        self._breaker_timer = None
+        _LOGGER.debug(
+            "%s: Circuit breaker %s", self.address, self._breaker.state.value
+        )
+        self._fire_connection_status_callbacks()
+
+    def _schedule_reconnect(self) -> None:
+        """Start reconnecting in background unless it is already running."""
+        if self._reconnect_task and not self._reconnect_task.done():
+            return
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
     async def _reconnect(self) -> None:
         """Attempt a reconnect"""
         _LOGGER.debug("%s: Reconnect, ensuring connection", self.address)
         async with self._seq_num_lock:
-            self._current_seq_num = 1
-        try:
-            if self._expected_disconnect:
-                return
-            await self._ensure_connected()
-            if self._expected_disconnect:
+            self._protocol.reset_seq_num()
+        while not self._expected_disconnect:
+            try:
+                await self._ensure_connected()
+                if self._expected_disconnect:
+                    return
+                _LOGGER.debug("%s: Reconnect, connection ensured", self.address)
                 return
-            _LOGGER.debug("%s: Reconnect, connection ensured", self.address)
-        except BLEAK_EXCEPTIONS:  # BleakNotFoundError:
-            _LOGGER.debug(
-                "%s: Reconnect, failed to ensure connection - backing off",
-                self.address,
-                exc_info=True,
-            )
-            await asyncio.sleep(BLEAK_BACKOFF_TIME)
-            _LOGGER.debug("%s: Reconnecting again", self.address)
-            asyncio.create_task(self._reconnect())
-
-    @staticmethod
-    def _calc_crc16(data: bytes) -> int:
-        crc = 0xFFFF
-        for byte in data:
-            crc ^= byte & 255
-            for _ in range(8):
-                tmp = crc & 1
-                crc >>= 1
-                if tmp != 0:
-                    crc ^= 0xA001
-        return crc
-
-    @staticmethod
-    def _pack_int(value: int) -> bytearray:
-        curr_byte: int
-        result = bytearray()
-        while True:
-            curr_byte = value & 0x7F
-            value >>= 7
-            if value != 0:
-                curr_byte |= 0x80
-            result += pack(">B", curr_byte)
-            if value == 0:
-                break
-        return result
-
-    @staticmethod
-    def _unpack_int(data: bytes, start_pos: int) -> tuple(int, int):
-        result: int = 0
-        offset: int = 0
-        while offset < 5:
-            pos: int = start_pos + offset
-            if pos >= len(data):
-                raise TuyaBLEDataFormatError()
-            curr_byte: int = data[pos]
-            result |= (curr_byte & 0x7F) << (offset * 7)
-            offset += 1
-            if (curr_byte & 0x80) == 0:
-                break
-        if offset > 4:
-            raise TuyaBLEDataFormatError()
-        else:
-            return (result, start_pos + offset)
-
-    def _build_packets(
-        self,
-        seq_num: int,
-        code: TuyaBLECode,
-        data: bytes,
-        response_to: int = 0,
-    ) -> list[bytes]:
-        key: bytes
-        iv = secrets.token_bytes(16)
-        security_flag: bytes
-        if code == TuyaBLECode.FUN_SENDER_DEVICE_INFO:
-            key = self._login_key
-            security_flag = b"\x04"
-        else:
-            key = self._session_key
-            security_flag = b"\x05"
-
-        raw = bytearray()
-        raw += pack(">IIHH", seq_num, response_to, code.value, len(data))
-        raw += data
-        crc = self._calc_crc16(raw)
-        raw += pack(">H", crc)
-        while len(raw) % 16 != 0:
-            raw += b"\x00"
-
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        encrypted = security_flag + iv + cipher.encrypt(raw)
-
-        command = []
-        packet_num = 0
-        pos = 0
-        length = len(encrypted)
-        while pos < length:
-            packet = bytearray()
-            packet += self._pack_int(packet_num)
-
-            if packet_num == 0:
-                packet += self._pack_int(length)
-                packet += pack(">B", self._protocol_version << 4)
-
-            data_part = encrypted[
-                pos:pos + GATT_MTU - len(packet)  # fmt: skip
-            ]
-            packet += data_part
-            command.append(packet)
-
-            pos += len(data_part)
-            packet_num += 1
-
-        return command
+            except BLEAK_EXCEPTIONS:  # BleakNotFoundError:
+                # Wait until the breaker lets the next attempt through
+                delay = max(
+                    self._breaker.retry_after,
+                    self._reconnect_policy.get_delay(self._breaker.failures),
+                )
+                _LOGGER.debug(
+                    "%s: Reconnect, failed to ensure connection"
+                    " - backing off %.1fs",
+                    self.address,
+                    delay,
+                    exc_info=True,
+                )
+                await asyncio.sleep(delay)
+                _LOGGER.debug("%s: Reconnecting again", self.address)
+
+    def _update_gatt_mtu(self) -> None:
+        """Update size of written data from the MTU of current connection."""
+        gatt_mtu = GATT_MTU
+        if self._gatt_mtu_override:
+            # Smaller writes would not fit header of the first packet
+            gatt_mtu = max(GATT_MTU, self._gatt_mtu_override)
+        elif self._client:
+            try:
+                characteristic = self._client.services.get_characteristic(
+                    CHARACTERISTIC_WRITE
+                )
+                if characteristic:
+                    gatt_mtu = max(
+                        GATT_MTU, characteristic.max_write_without_response_size
+                    )
+            except (*BLEAK_EXCEPTIONS, AttributeError):
+                _LOGGER.debug(
+                    "%s: MTU is not available, using default", self.address
+                )
+        if gatt_mtu != self._protocol.gatt_mtu:
+            _LOGGER.debug("%s: Using MTU %s", self.address, gatt_mtu)
+            self._protocol.gatt_mtu = gatt_mtu
 
     async def _get_seq_num(self) -> int:
         async with self._seq_num_lock:
-            result = self._current_seq_num
-            self._current_seq_num += 1
-        return result
+            return self._protocol.next_seq_num()
 
     async def _send_packet(
         self,
@@ -966,24 +1355,69 @@ class TuyaBLEDevice:
         data: bytes,
         wait_for_response: bool = True,
         # retry: int | None = None,
-    ) -> None:
+        priority: TuyaBLESendPriority = TuyaBLESendPriority.COMMAND,
+    ) -> bool:
         """Send packet to device and optional read response."""
         if self._expected_disconnect:
-            return
+            return False
         await self._ensure_connected()
         if self._expected_disconnect:
-            return
-        await self._send_packet_while_connected(code, data, 0, wait_for_response)
+            return False
+        return await self._send_packet_while_connected(
+            code, data, 0, wait_for_response, priority
+        )
 
-    async def _send_response(
+    def _queue_response(
         self,
         code: TuyaBLECode,
         data: bytes,
         response_to: int,
     ) -> None:
-        """Send response to received packet."""
-        if self._client and self._client.is_connected:
-            await self._send_packet_while_connected(code, data, response_to, False)
+        """Queue response to received packet."""
+        self._pending_responses.append((code, data, response_to))
+        if self._responses_writer is None or self._responses_writer.done():
+            self._responses_writer = asyncio.create_task(self._write_responses())
+
+    async def _write_responses(self) -> None:
+        """Write queued responses back-to-back while holding the writer."""
+        priority = TuyaBLESendPriority.RESPONSE
+        self._log_send_queue(priority)
+        async with self._send_queue.write(priority):
+            # Responses received while writing are sent in the next burst
+            while self._pending_responses:
+                responses = self._pending_responses
+                self._pending_responses = []
+                if not (self._client and self._client.is_connected):
+                    _LOGGER.debug(
+                        "%s: Not connected, dropping %s responses",
+                        self.address,
+                        len(responses),
+                    )
+                    return
+                packets: list[bytes] = []
+                for code, data, response_to in responses:
+                    seq_num = await self._get_seq_num()
+                    _LOGGER.debug(
+                        "%s: Sending packet: #%s %s in response to #%s",
+                        self.address,
+                        seq_num,
+                        code.name,
+                        response_to,
+                    )
+                    packets += self._protocol.build_packets(
+                        seq_num, code, data, response_to)
+                try:
+                    await self._write_packets(packets, priority)
+                except BLEAK_EXCEPTIONS:
+                    self._pending_responses.clear()
+                    return
+                self._responses_stats.add_burst(len(responses))
+                if len(responses) > 1:
+                    _LOGGER.debug(
+                        "%s: Sent %s responses in one burst",
+                        self.address,
+                        len(responses),
+                    )
 
     async def _send_packet_while_connected(
         self,
@@ -992,86 +1426,161 @@ class TuyaBLEDevice:
         response_to: int,
         wait_for_response: bool,
         # retry: int | None = None
+        priority: TuyaBLESendPriority = TuyaBLESendPriority.COMMAND,
     ) -> bool:
         """Send packet to device and optional read response."""
+        if wait_for_response:
+            async with self._send_queue.request(priority):
+                return await self._send_packet_in_turn(
+                    code, data, response_to, True, priority
+                )
+        return await self._send_packet_in_turn(
+            code, data, response_to, False, priority
+        )
+
+    async def _send_packet_in_turn(
+        self,
+        code: TuyaBLECode,
+        data: bytes,
+        response_to: int,
+        wait_for_response: bool,
+        priority: TuyaBLESendPriority,
+    ) -> bool:
         result = True
         future: asyncio.Future | None = None
-        seq_num = await self._get_seq_num()
-        if wait_for_response:
-            future = asyncio.Future()
-            self._input_expected_responses[seq_num] = future
+        seq_num = 0
+        try:
+            self._log_send_queue(priority)
+            async with self._send_queue.write(priority):
+                # Sequence number is taken in turn, so frames reordered by
+                # priority are still numbered in the order they are written
+                seq_num = await self._get_seq_num()
+                if wait_for_response:
+                    future = asyncio.Future()
+                    self._input_expected_responses[seq_num] = future
+
+                if response_to > 0:
+                    _LOGGER.debug(
+                        "%s: Sending packet: #%s %s in response to #%s",
+                        self.address,
+                        seq_num,
+                        code.name,
+                        response_to,
+                    )
+                else:
+                    _LOGGER.debug(
+                        "%s: Sending packet: #%s %s",
+                        self.address,
+                        seq_num,
+                        code.name,
+                    )
+                packets: list[bytes] = self._protocol.build_packets(
+                    seq_num, code, data, response_to)
+                # Response may arrive while the last packets are written
+                sent_at = time.monotonic()
+                await self._write_packets(packets, priority)
+            if future:
+                timeout = self._rtt.timeout
+                try:
+                    await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    self._rtt.add_timeout()
+                    _LOGGER.error(
+                        "%s: timeout receiving response in %.1fs, RSSI: %s",
+                        self.address,
+                        timeout,
+                        self.rssi,
+                    )
+                    result = False
+                except TuyaBLEDeviceError:
+                    self._rtt.add_sample(time.monotonic() - sent_at)
+                    raise
+                else:
+                    self._rtt.add_sample(time.monotonic() - sent_at)
+        finally:
+            # Sequence numbers restart after reconnect, don't remove
+            # the future of a newer request
+            if future and self._input_expected_responses.get(seq_num) is future:
+                self._input_expected_responses.pop(seq_num)
 
-        if response_to > 0:
-            _LOGGER.debug(
-                "%s: Sending packet: #%s %s in response to #%s",
-                self.address,
-                seq_num,
-                code.name,
-                response_to,
-            )
-        else:
+        return result
+
+    def _fail_expected_responses(self) -> None:
+        """Fail all requests waiting for response, connection was lost."""
+        expected_responses = self._input_expected_responses
+        if not expected_responses:
+            return
+        self._input_expected_responses = {}
+        _LOGGER.debug(
+            "%s: Connection lost, failing %s pending requests",
+            self.address,
+            len(expected_responses),
+        )
+        for future in expected_responses.values():
+            if future and not future.done():
+                future.set_exception(TuyaBLEDisconnectedError())
+
+    def _log_send_queue(self, priority: TuyaBLESendPriority) -> None:
+        if self._send_queue.busy:
             _LOGGER.debug(
-                "%s: Sending packet: #%s %s",
+                "%s: Operation already in progress, waiting for it to complete;"
+                " priority: %s, queued: %s, outstanding: %s; RSSI: %s",
                 self.address,
-                seq_num,
-                code.name,
+                priority.name,
+                self._send_queue.depth,
+                self._send_queue.outstanding,
+                self.rssi,
             )
-        packets: list[bytes] = self._build_packets(
-            seq_num, code, data, response_to)
-        await self._int_send_packet_while_connected(packets)
-        if future:
-            try:
-                await asyncio.wait_for(future, RESPONSE_WAIT_TIMEOUT)
-            except asyncio.TimeoutError:
-                _LOGGER.error(
-                    "%s: timeout receiving response, RSSI: %s",
-                    self.address,
-                    self.rssi,
-                )
-                result = False
-            self._input_expected_responses.pop(seq_num, None)
-
-        return result
 
     async def _int_send_packet_while_connected(
         self,
         packets: list[bytes],
+        priority: TuyaBLESendPriority,
     ) -> None:
-        if self._operation_lock.locked():
-            _LOGGER.debug(
-                "%s: Operation already in progress, "
-                "waiting for it to complete; RSSI: %s",
+        self._log_send_queue(priority)
+        async with self._send_queue.write(priority):
+            await self._write_packets(packets, priority)
+
+    async def _write_packets(
+        self,
+        packets: list[bytes],
+        priority: TuyaBLESendPriority,
+    ) -> None:
+        try:
+            await self._send_packets_locked(packets, priority)
+        except BleakNotFoundError:
+            _LOGGER.error(
+                "%s: device not found, no longer in range, or poor RSSI: %s",
                 self.address,
                 self.rssi,
+                exc_info=True,
             )
-        async with self._operation_lock:
-            try:
-                await self._send_packets_locked(packets)
-            except BleakNotFoundError:
-                _LOGGER.error(
-                    "%s: device not found, no longer in range, or poor RSSI: %s",
-                    self.address,
-                    self.rssi,
-                    exc_info=True,
-                )
-                raise
-            except BLEAK_EXCEPTIONS:
-                _LOGGER.error(
-                    "%s: communication failed",
-                    self.address,
-                    exc_info=True,
-                )
-                raise
+            raise
+        except BLEAK_EXCEPTIONS:
+            _LOGGER.error(
+                "%s: communication failed",
+                self.address,
+                exc_info=True,
+            )
+            raise
 
-    async def _resend_packets(self, packets: list[bytes]) -> None:
+    async def _resend_packets(
+        self,
+        packets: list[bytes],
+        priority: TuyaBLESendPriority,
+    ) -> None:
         if self._expected_disconnect:
             return
         await self._ensure_connected()
         if self._expected_disconnect:
             return
-        await self._int_send_packet_while_connected(packets)
+        await self._int_send_packet_while_connected(packets, priority)
 
-    async def _send_packets_locked(self, packets: list[bytes]) -> None:
+    async def _send_packets_locked(
+        self,
+        packets: list[bytes],
+        priority: TuyaBLESendPriority,
+    ) -> None:
         """Send command to device and read response."""
         try:
             await self._int_send_packets_locked(packets)
@@ -1086,9 +1595,9 @@ class TuyaBLEDevice:
                 ex,
             )
             if self._is_paired:
-                asyncio.create_task(self._resend_packets(packets))
+                asyncio.create_task(self._resend_packets(packets, priority))
             else:
-                asyncio.create_task(self._reconnect())
+                self._schedule_reconnect()
             raise BleakError from ex
         except BleakError as ex:
             # Disconnect so we can reset state and try again
@@ -1099,15 +1608,17 @@ class TuyaBLEDevice:
                 ex,
             )
             if self._is_paired:
-                asyncio.create_task(self._resend_packets(packets))
+                asyncio.create_task(self._resend_packets(packets, priority))
             else:
-                asyncio.create_task(self._reconnect())
+                self._schedule_reconnect()
             raise
 
     async def _int_send_packets_locked(self, packets: list[bytes]) -> None:
         """Execute command and read response."""
         for packet in packets:
             if self._client:
+                if self._capture:
+                    self._capture.write(TuyaBLECaptureRecordType.SENT, packet)
                 try:
                     # _LOGGER.debug("%s: Sending packet: %s", self.address, packet.hex())
                     await self._client.write_gatt_char(
@@ -1132,325 +1643,43 @@ class TuyaBLEDevice:
                 )
                 raise BleakError()
 
-    def _get_key(self, security_flag: int) -> bytes:
-        if security_flag == 1:
-            return self._auth_key
-        if security_flag == 4:
-            return self._login_key
-        elif security_flag == 5:
-            return self._session_key
-        else:
-            pass
-
-    def _parse_timestamp(self, data: bytes, start_pos: int) -> tuple(float, int):
-        timestamp: float
-        pos = start_pos
-        if pos >= len(data):
-            raise TuyaBLEDataLengthError()
-        time_type = data[pos]
-        pos += 1
-        end_pos = pos
-        match time_type:
-            case 0:
-                end_pos += 13
-                if end_pos > len(data):
-                    raise TuyaBLEDataLengthError()
-                timestamp = int(data[pos:end_pos].decode()) / 1000
-                pass
-            case 1:
-                end_pos += 4
-                if end_pos > len(data):
-                    raise TuyaBLEDataLengthError()
-                timestamp = int.from_bytes(data[pos:end_pos], "big") * 1.0
-                pass
-            case _:
-                raise TuyaBLEDataFormatError()
-
-        _LOGGER.debug(
-            "%s: Received timestamp: %s",
-            self.address,
-            time.ctime(timestamp),
-        )
-        return (timestamp, end_pos)
-
-    def _parse_datapoints_v3(
-        self, timestamp: float, flags: int, data: bytes, start_pos: int
-    ) -> int:
-        datapoints: list[TuyaBLEDataPoint] = []
-
-        pos = start_pos
-        while len(data) - pos >= 4:
-            id: int = data[pos]
-            pos += 1
-            _type: int = data[pos]
-            if _type > TuyaBLEDataPointType.DT_BITMAP.value:
-                raise TuyaBLEDataFormatError()
-            type: TuyaBLEDataPointType = TuyaBLEDataPointType(_type)
-            pos += 1
-            data_len: int = data[pos]
-            pos += 1
-            next_pos = pos + data_len
-            if next_pos > len(data):
-                raise TuyaBLEDataLengthError()
-            raw_value = data[pos:next_pos]
-            match type:
-                case (TuyaBLEDataPointType.DT_RAW | TuyaBLEDataPointType.DT_BITMAP):
-                    value = raw_value
-                case TuyaBLEDataPointType.DT_BOOL:
-                    value = int.from_bytes(raw_value, "big") != 0
-                case (TuyaBLEDataPointType.DT_VALUE | TuyaBLEDataPointType.DT_ENUM):
-                    value = int.from_bytes(raw_value, "big", signed=True)
-                case TuyaBLEDataPointType.DT_STRING:
-                    value = raw_value.decode()
-
-            _LOGGER.debug(
-                "%s: Received datapoint update, id: %s, type: %s: value: %s",
-                self.address,
-                id,
-                type.name,
-                value,
-            )
-            self._datapoints._update_from_device(
-                id, timestamp, flags, type, value)
-            datapoints.append(self._datapoints[id])
-            pos = next_pos
-
-        self._fire_callbacks(datapoints)
-
-    def _handle_command_or_response(
-        self, seq_num: int, response_to: int, code: TuyaBLECode, data: bytes
-    ) -> None:
-        result: int = 0
-
-        match code:
-            case TuyaBLECode.FUN_SENDER_DEVICE_INFO:
-                if len(data) < 46:
-                    raise TuyaBLEDataLengthError()
-
-                self._device_version = ("%s.%s") % (data[0], data[1])
-                self._protocol_version_str = ("%s.%s") % (data[2], data[3])
-                self._hardware_version = ("%s.%s") % (data[12], data[13])
-
-                self._protocol_version = data[2]
-                self._flags = data[4]
-                self._is_bound = data[5] != 0
-
-                srand = data[6:12]
-                self._session_key = hashlib.md5(
-                    self._local_key + srand).digest()
-                self._auth_key = data[14:46]
-
-            case TuyaBLECode.FUN_SENDER_PAIR:
-                if len(data) != 1:
-                    raise TuyaBLEDataLengthError()
-                result = data[0]
-                if result == 2:
-                    _LOGGER.debug(
-                        "%s: Device is already paired",
-                        self.address,
-                    )
-                    result = 0
-                self._is_paired = result == 0
-
-            case TuyaBLECode.FUN_SENDER_DEVICE_STATUS:
-                if len(data) != 1:
-                    raise TuyaBLEDataLengthError()
-                result = data[0]
-
-            case TuyaBLECode.FUN_RECEIVE_TIME1_REQ:
-                if len(data) != 0:
-                    raise TuyaBLEDataLengthError()
-
-                timestamp = int(time.time_ns() / 1000000)
-                timezone = -int(time.timezone / 36)
-                data = str(timestamp).encode() + pack(">h", timezone)
-                asyncio.create_task(self._send_response(code, data, seq_num))
-
-            case TuyaBLECode.FUN_RECEIVE_TIME2_REQ:
-                if len(data) != 0:
-                    raise TuyaBLEDataLengthError()
-
-                time_str: time.struct_time = time.localtime()
-                timezone = -int(time.timezone / 36)
-                data = pack(
-                    ">BBBBBBBh",
-                    time_str.tm_year % 100,
-                    time_str.tm_mon,
-                    time_str.tm_mday,
-                    time_str.tm_hour,
-                    time_str.tm_min,
-                    time_str.tm_sec,
-                    time_str.tm_wday,
-                    timezone,
+    def _handle_event(self, event: TuyaBLEEvent) -> None:
+        if isinstance(event, TuyaBLEDatapointsEvent):
+            datapoints: list[TuyaBLEDataPoint] = []
+            for dp_id, type, value in event.datapoints:
+                self._datapoints._update_from_device(
+                    dp_id, event.timestamp, event.flags, type, value
                 )
-                asyncio.create_task(self._send_response(code, data, seq_num))
-
-            case TuyaBLECode.FUN_RECEIVE_DP:
-                self._parse_datapoints_v3(time.time(), 0, data, 0)
-                asyncio.create_task(
-                    self._send_response(code, bytes(0), seq_num))
-
-            case TuyaBLECode.FUN_RECEIVE_SIGN_DP:
-                dp_seq_num = int.from_bytes(data[:2], "big")
-                flags = data[2]
-                self._parse_datapoints_v3(time.time(), flags, data, 2)
-                data = pack(">HBB", dp_seq_num, flags, 0)
-                asyncio.create_task(self._send_response(code, data, seq_num))
-
-            case TuyaBLECode.FUN_RECEIVE_TIME_DP:
-                timestamp: float
-                pos: int
-                timestamp, pos = self._parse_timestamp(data, 0)
-                self._parse_datapoints_v3(timestamp, 0, data, pos)
-                asyncio.create_task(
-                    self._send_response(code, bytes(0), seq_num))
-
-            case TuyaBLECode.FUN_RECEIVE_SIGN_TIME_DP:
-                timestamp: float
-                pos: int
-                dp_seq_num = int.from_bytes(data[:2], "big")
-                flags = data[2]
-                timestamp, pos = self._parse_timestamp(data, 3)
-                self._parse_datapoints_v3(time.time(), flags, data, pos)
-                data = pack(">HBB", dp_seq_num, flags, 0)
-                asyncio.create_task(self._send_response(code, data, seq_num))
-
-        if response_to != 0:
-            future = self._input_expected_responses.pop(response_to, None)
+                datapoints.append(self._datapoints[dp_id])
+            self._schedule_callbacks(datapoints)
+        elif isinstance(event, TuyaBLEReplyEvent):
+            self._queue_response(event.code, event.data, event.response_to)
+        elif isinstance(event, TuyaBLEResponseEvent):
+            future = self._input_expected_responses.pop(event.response_to, None)
             if future:
                 _LOGGER.debug(
                     "%s: Received expected response to #%s, result: %s",
                     self.address,
-                    response_to,
-                    result,
+                    event.response_to,
+                    event.result,
                 )
-                if result == 0:
-                    future.set_result(result)
+                if event.result == 0:
+                    future.set_result(event.result)
                 else:
-                    future.set_exception(TuyaBLEDeviceError(result))
-
-    def _clean_input(self) -> None:
-        self._input_buffer = None
-        self._input_expected_packet_num = 0
-        self._input_expected_length = 0
-
-    def _parse_input(self) -> None:
-        security_flag = self._input_buffer[0]
-        key = self._get_key(security_flag)
-        iv = self._input_buffer[1:17]
-        encrypted = self._input_buffer[17:]
-
-        self._clean_input()
-
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        raw = cipher.decrypt(encrypted)
-
-        seq_num: int
-        response_to: int
-        _code: int
-        length: int
-        seq_num, response_to, _code, length = unpack(">IIHH", raw[:12])
-
-        data_end_pos = length + 12
-        raw_length = len(raw)
-        if raw_length < data_end_pos:
-            raise TuyaBLEDataLengthError()
-        if raw_length > data_end_pos:
-            calc_crc = self._calc_crc16(raw[:data_end_pos])
-            (data_crc,) = unpack(
-                ">H",
-                raw[data_end_pos:data_end_pos + 2]  # fmt: skip
-            )
-            if calc_crc != data_crc:
-                raise TuyaBLEDataCRCError()
-        data = raw[12:data_end_pos]
-
-        code: TuyaBLECode
-        try:
-            code = TuyaBLECode(_code)
-        except ValueError:
-            _LOGGER.debug(
-                "%s: Received unknown message: #%s %x, response to #%s, data %s",
-                self.address,
-                seq_num,
-                _code,
-                response_to,
-                data.hex(),
-            )
-            return
-
-        if response_to != 0:
-            _LOGGER.debug(
-                "%s: Received: #%s %s, response to #%s",
-                self.address,
-                seq_num,
-                code.name,
-                response_to,
-            )
-        else:
-            _LOGGER.debug(
-                "%s: Received: #%s %s",
-                self.address,
-                seq_num,
-                code.name,
-            )
-
-        self._handle_command_or_response(seq_num, response_to, code, data)
+                    future.set_exception(TuyaBLEDeviceError(event.result))
 
     def _notification_handler(self, _sender: int, data: bytearray) -> None:
         """Handle notification responses."""
-        _LOGGER.debug("%s: Packet received: %s", self.address, data.hex())
-
-        pos: int = 0
-        packet_num: int
+        if self._capture:
+            self._capture.write(TuyaBLECaptureRecordType.RECEIVED, data)
+        for event in self._protocol.receive_data(data):
+            self._handle_event(event)
 
-        packet_num, pos = self._unpack_int(data, pos)
-
-        if packet_num < self._input_expected_packet_num:
-            _LOGGER.error(
-                "%s: Unexpcted packet (number %s) in notifications, " "expected %s",
-                self.address,
-                packet_num,
-                self._input_expected_packet_num,
-            )
-            self._clean_input()
-
-        if packet_num == self._input_expected_packet_num:
-            if packet_num == 0:
-                self._input_buffer = bytearray()
-                self._input_expected_length, pos = self._unpack_int(data, pos)
-                pos += 1
-            self._input_buffer += data[pos:]
-            self._input_expected_packet_num += 1
-        else:
-            _LOGGER.error(
-                "%s: Missing packet (number %s) in notifications, received %s",
-                self.address,
-                self._input_expected_packet_num,
-                packet_num,
-            )
-            self._clean_input()
-            return
-
-        if len(self._input_buffer) > self._input_expected_length:
-            _LOGGER.error(
-                "%s: Unexpcted length of data in notifications, "
-                "received %s expected %s",
-                self.address,
-                len(self._input_buffer),
-                self._input_expected_length,
-            )
-            self._clean_input()
-            return
-        elif len(self._input_buffer) == self._input_expected_length:
-            self._parse_input()
-
-    async def _send_datapoints_v3(self, datapoint_ids: list[int]) -> None:
+    async def _send_datapoints(self, datapoint_ids: list[int]) -> bool:
         """Send new values of datapoints to the device."""
-        data = bytearray()
+        values: list[tuple[int, TuyaBLEDataPointType, bytes]] = []
         for dp_id in datapoint_ids:
             dp = self._datapoints[dp_id]
-            value = dp._get_value()
             _LOGGER.debug(
                 "%s: Sending datapoint update, id: %s, type: %s: value: %s",
                 self.address,
@@ -1458,14 +1687,6 @@ class TuyaBLEDevice:
                 dp.type.name,
                 dp.value,
             )
-            data += pack(">BBB", dp.id, int(dp.type.value), len(value))
-            data += value
-
-        await self._send_packet(TuyaBLECode.FUN_SENDER_DPS, data)
-
-    async def _send_datapoints(self, datapoint_ids: list[int]) -> None:
-        """Send new values of datapoints to the device."""
-        if self._protocol_version == 3:
-            await self._send_datapoints_v3(datapoint_ids)
-        else:
-            raise TuyaBLEDeviceError(0)
+            values.append((dp.id, dp.type, dp._get_value()))
+        code, data = self._protocol.build_datapoints(values)
+        return await self._send_packet(code, data)